@@ -0,0 +1,215 @@
+from typing import List, Dict, Any, Optional, Sequence
+from datetime import datetime, date, timedelta
+import heapq
+import numpy as np
+import pandas as pd
+
+# (output key, post column) pairs for every averaged metric, in dashboard order
+POST_METRIC_FIELDS = [
+    ('avg_likes', 'likes'),
+    ('avg_comments', 'comments'),
+    ('avg_shares', 'shares'),
+    ('avg_reach', 'reach'),
+    ('avg_impressions', 'impressions'),
+    ('avg_engagement', 'engagement'),
+    ('avg_ctr', 'click_through_rate'),
+    ('avg_watch_time', 'watch_time')
+]
+
+# Engagement percentiles reported when callers ask for them
+PERCENTILES = (50, 90, 99)
+
+# Per-type engagement sample size used for percentiles on streamed reads
+RESERVOIR_SIZE = 100000
+
+def window_start(days: int) -> datetime:
+    """Return the start of the last-N-days window: midnight of the day N - 1 days before today
+
+    Every backend and read path uses these N whole calendar days (today included),
+    so per-day rollups and raw post reads cover exactly the same posts.
+    """
+    midnight = datetime.combine(datetime.now().date(), datetime.min.time())
+    return midnight - timedelta(days=days - 1)
+
+def window_days(days: int) -> List[date]:
+    """Return the day buckets of the last-N-days window, oldest first"""
+    first = window_start(days).date()
+    return [first + timedelta(days=offset) for offset in range(days)]
+
+def empty_post_type_sums(post_type: str) -> Dict[str, Any]:
+    """Create a zeroed running-sum record for one post type"""
+    sums = {'post_type': post_type, 'total_posts': 0}
+    for _, column in POST_METRIC_FIELDS:
+        sums[column] = 0
+    return sums
+
+def add_post(sums_by_type: Dict[str, Dict[str, Any]], post: Dict[str, Any]) -> None:
+    """Add a single post row to the per-type running sums"""
+    post_type = post.get('post_type') or 'unknown'
+    sums = sums_by_type.get(post_type)
+    if sums is None:
+        sums = sums_by_type[post_type] = empty_post_type_sums(post_type)
+    sums['total_posts'] += 1
+    for _, column in POST_METRIC_FIELDS:
+        sums[column] += post.get(column) or 0
+
+def merge_post_type_sums(target: Dict[str, Dict[str, Any]], other: Dict[str, Dict[str, Any]]) -> None:
+    """Merge partial per-type sums from `other` into `target` in place"""
+    for post_type, sums in other.items():
+        merged = target.get(post_type)
+        if merged is None:
+            merged = target[post_type] = empty_post_type_sums(post_type)
+        merged['total_posts'] += sums['total_posts']
+        for _, column in POST_METRIC_FIELDS:
+            merged[column] += sums[column]
+
+def finalize_post_type_metrics(sums_by_type: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turn per-type sums into the averaged metrics format used by the dashboard"""
+    metrics = []
+    for post_type, sums in sums_by_type.items():
+        total_posts = sums['total_posts']
+        entry = {'post_type': post_type, 'total_posts': total_posts}
+        for key, column in POST_METRIC_FIELDS:
+            entry[key] = round(sums[column] / total_posts, 2) if total_posts > 0 else 0
+        metrics.append(entry)
+    return metrics
+
+def add_hashtag(stats_by_tag: Dict[str, Dict[str, Any]], hashtag: str, usage_count: int, total_engagement: float) -> None:
+    """Add usage and engagement for one hashtag to the running stats"""
+    stats = stats_by_tag.get(hashtag)
+    if stats is None:
+        stats = stats_by_tag[hashtag] = {'hashtag': hashtag, 'usage_count': 0, 'total_engagement': 0}
+    stats['usage_count'] += usage_count
+    stats['total_engagement'] += total_engagement
+
+def top_hashtags(stats_by_tag: Dict[str, Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Return the `limit` hashtags with the highest average engagement"""
+    used = (stats for stats in stats_by_tag.values() if stats['usage_count'] > 0)
+
+    # Bounded heap keeps this O(n log k) instead of sorting every hashtag
+    top = heapq.nlargest(limit, used, key=lambda x: x['total_engagement'] / x['usage_count'])
+
+    return [{
+        'hashtag': stats['hashtag'],
+        'usage_count': stats['usage_count'],
+        'total_engagement': round(stats['total_engagement'], 2),
+        'avg_engagement': round(stats['total_engagement'] / stats['usage_count'], 2)
+    } for stats in top]
+
+class PostTypeAggregator:
+    """Running per-type sums fed one result page at a time, in bounded memory"""
+
+    def __init__(self, percentiles: bool = False, reservoir_size: int = RESERVOIR_SIZE, seed: Optional[int] = None):
+        self.sums_by_type: Dict[str, Dict[str, Any]] = {}
+        self.percentiles = percentiles
+        self.reservoir_size = reservoir_size
+        self._samples: Dict[str, np.ndarray] = {}
+        self._seen: Dict[str, int] = {}
+        self._rng = np.random.default_rng(seed)
+
+    def add_page(self, page: Sequence[Dict[str, Any]]) -> None:
+        """Fold one page of post rows into the running sums with a vectorized groupby"""
+        if not page:
+            return
+
+        columns = [column for _, column in POST_METRIC_FIELDS]
+        frame = pd.DataFrame.from_records(page, columns=['post_type'] + columns)
+        frame['post_type'] = frame['post_type'].replace('', None).fillna('unknown')
+        frame[columns] = frame[columns].astype(float).fillna(0)
+
+        grouped = frame.groupby('post_type', sort=False)
+        counts = grouped.size()
+        sums = grouped[columns].sum()
+
+        partial = {}
+        for post_type, total_posts in counts.items():
+            entry = {'post_type': post_type, 'total_posts': int(total_posts)}
+            for column in columns:
+                entry[column] = float(sums.at[post_type, column])
+            partial[post_type] = entry
+        merge_post_type_sums(self.sums_by_type, partial)
+
+        if self.percentiles:
+            for post_type, values in grouped['engagement']:
+                self._sample(post_type, values.to_numpy())
+
+    def _sample(self, post_type: str, values: np.ndarray) -> None:
+        # Reservoir sampling keeps percentile memory fixed; exact until a type exceeds the reservoir
+        sample = self._samples.get(post_type, np.empty(0))
+        seen = self._seen.get(post_type, 0)
+
+        room = max(0, self.reservoir_size - len(sample))
+        if room:
+            taken = values[:room]
+            sample = np.concatenate([sample, taken])
+            values = values[room:]
+            seen += len(taken)
+        if len(values):
+            positions = np.arange(seen, seen + len(values)) + 1
+            slots = (self._rng.random(len(values)) * positions).astype(np.int64)
+            keep = slots < self.reservoir_size
+            sample[slots[keep]] = values[keep]
+            seen += len(values)
+
+        self._samples[post_type] = sample
+        self._seen[post_type] = seen
+
+    def merge(self, other: "PostTypeAggregator") -> None:
+        """Merge another aggregator's partial results into this one"""
+        merge_post_type_sums(self.sums_by_type, other.sums_by_type)
+        for post_type, other_sample in other._samples.items():
+            sample = self._samples.get(post_type, np.empty(0))
+            seen = self._seen.get(post_type, 0)
+            other_seen = other._seen[post_type]
+
+            if len(sample) + len(other_sample) <= self.reservoir_size:
+                merged = np.concatenate([sample, other_sample])
+            else:
+                # Draw from each reservoir in proportion to how many values it stands for
+                from_self = self._rng.binomial(self.reservoir_size, seen / (seen + other_seen))
+                from_self = min(max(from_self, self.reservoir_size - len(other_sample)), len(sample))
+                from_other = min(self.reservoir_size - from_self, len(other_sample))
+                merged = np.concatenate([
+                    self._rng.choice(sample, from_self, replace=False),
+                    self._rng.choice(other_sample, from_other, replace=False)
+                ])
+
+            self._samples[post_type] = merged
+            self._seen[post_type] = seen + other_seen
+
+    def result(self) -> List[Dict[str, Any]]:
+        """Return metrics in the finalize_post_type_metrics format, plus percentiles if enabled"""
+        metrics = finalize_post_type_metrics(self.sums_by_type)
+        if self.percentiles:
+            for entry in metrics:
+                sample = self._samples.get(entry['post_type'])
+                for p in PERCENTILES:
+                    value = float(np.percentile(sample, p)) if sample is not None and len(sample) else 0
+                    entry[f"p{p}_engagement"] = round(value, 2)
+        return metrics
+
+class HashtagAggregator:
+    """Running per-hashtag usage and engagement fed one result page at a time"""
+
+    def __init__(self):
+        self.stats_by_tag: Dict[str, Dict[str, Any]] = {}
+
+    def add_page(self, page: Sequence[Dict[str, Any]]) -> None:
+        """Fold one page of post_hashtags rows into the running stats"""
+        if not page:
+            return
+
+        frame = pd.DataFrame.from_records(page, columns=['hashtag', 'engagement'])
+        frame = frame[frame['hashtag'].fillna('') != '']
+        grouped = frame['engagement'].astype(float).fillna(0).groupby(frame['hashtag'], sort=False).agg(['size', 'sum'])
+        for hashtag, row in grouped.iterrows():
+            add_hashtag(self.stats_by_tag, hashtag, int(row['size']), float(row['sum']))
+
+    def merge(self, other: "HashtagAggregator") -> None:
+        """Merge another aggregator's partial results into this one"""
+        for hashtag, stats in other.stats_by_tag.items():
+            add_hashtag(self.stats_by_tag, hashtag, stats['usage_count'], stats['total_engagement'])
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        """Return the `limit` hashtags with the highest average engagement"""
+        return top_hashtags(self.stats_by_tag, limit)
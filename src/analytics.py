@@ -1,121 +1,61 @@
-from db_connection import get_astra_session
-from typing import List, Dict, Any
-from collections import defaultdict
-from datetime import datetime, timedelta
+from storage import get_backend
+from query_cache import analytics_cache, cached_query
+from typing import List, Dict, Any, Iterator
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_post_type_metrics(days: int = 30) -> List[Dict[str, Any]]:
-    """Get metrics grouped by post type for the last N days"""
+@cached_query(analytics_cache)
+def get_post_type_metrics(days: int = 30, percentiles: bool = False) -> List[Dict[str, Any]]:
+    """Get metrics grouped by post type for the last N days, optionally with p50/p90/p99 engagement"""
     try:
-        session, _ = get_astra_session()
-        if not session:
-            logger.error("Failed to establish database connection")
-            return generate_mock_data()
-
-        # Calculate the timestamp for N days ago
-        start_date = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
-        
-        # Query posts
-        result = session.execute(
-            "SELECT * FROM social_media_posts WHERE created_at >= ?",
-            {"created_at": start_date}
-        )
-        
-        if not result or 'data' not in result:
+        metrics = get_backend().post_type_metrics(days, percentiles)
+        if not metrics:
             logger.warning("No data returned from database")
             return generate_mock_data()
-
-        # Process the results
-        metrics_by_type = defaultdict(lambda: {
-            'post_type': '',
-            'total_posts': 0,
-            'avg_likes': 0,
-            'avg_comments': 0,
-            'avg_shares': 0,
-            'avg_reach': 0,
-            'avg_impressions': 0,
-            'avg_engagement': 0,
-            'avg_ctr': 0,
-            'avg_watch_time': 0
-        })
-
-        for post in result.get('data', []):
-            post_type = post.get('post_type', 'unknown')
-            metrics = metrics_by_type[post_type]
-            metrics['post_type'] = post_type
-            metrics['total_posts'] += 1
-            metrics['avg_likes'] += post.get('likes', 0)
-            metrics['avg_comments'] += post.get('comments', 0)
-            metrics['avg_shares'] += post.get('shares', 0)
-            metrics['avg_reach'] += post.get('reach', 0)
-            metrics['avg_impressions'] += post.get('impressions', 0)
-            metrics['avg_engagement'] += post.get('engagement', 0)
-            metrics['avg_ctr'] += post.get('click_through_rate', 0)
-            metrics['avg_watch_time'] += post.get('watch_time', 0)
-
-        # Calculate averages
-        for metrics in metrics_by_type.values():
-            total_posts = metrics['total_posts']
-            if total_posts > 0:
-                for key in metrics:
-                    if key != 'post_type' and key != 'total_posts':
-                        metrics[key] = round(metrics[key] / total_posts, 2)
-
-        return list(metrics_by_type.values())
+        return metrics
 
     except Exception as e:
         logger.error(f"Error fetching post metrics: {str(e)}")
         return generate_mock_data()
 
-def get_trending_hashtags(limit: int = 5) -> List[Dict[str, Any]]:
-    """Get trending hashtags based on engagement"""
+@cached_query(analytics_cache)
+def get_trending_hashtags(limit: int = 5, days: int = 30, approximate: bool = False) -> List[Dict[str, Any]]:
+    """Get trending hashtags based on engagement over the last N days, optionally estimated from sketches"""
     try:
-        session, _ = get_astra_session()
-        if not session:
-            logger.error("Failed to establish database connection")
-            return generate_mock_hashtags()
-
-        # Query hashtags
-        result = session.execute("SELECT * FROM post_hashtags")
-        
-        if not result or 'data' not in result:
+        hashtags = get_backend().trending_hashtags(limit, days, approximate)
+        if not hashtags:
             logger.warning("No hashtag data returned from database")
             return generate_mock_hashtags()
+        return hashtags
 
-        # Process the results
-        hashtag_stats = defaultdict(lambda: {
-            'hashtag': '',
-            'usage_count': 0,
-            'total_engagement': 0,
-            'avg_engagement': 0
-        })
+    except Exception as e:
+        logger.error(f"Error fetching trending hashtags: {str(e)}")
+        return generate_mock_hashtags()
 
-        for hashtag_data in result.get('data', []):
-            hashtag = hashtag_data.get('hashtag', '')
-            if not hashtag:
-                continue
-                
-            stats = hashtag_stats[hashtag]
-            stats['hashtag'] = hashtag
-            stats['usage_count'] += 1
-            stats['total_engagement'] += hashtag_data.get('engagement', 0)
+@cached_query(analytics_cache)
+def get_distinct_hashtag_count(days: int = 30, approximate: bool = False) -> int:
+    """Get the number of distinct hashtags used over the last N days, optionally estimated with HyperLogLog"""
+    try:
+        return get_backend().distinct_hashtags(days, approximate)
 
-        # Calculate averages and prepare final list
-        trending_hashtags = []
-        for stats in hashtag_stats.values():
-            if stats['usage_count'] > 0:
-                stats['avg_engagement'] = round(stats['total_engagement'] / stats['usage_count'], 2)
-                trending_hashtags.append(stats)
+    except Exception as e:
+        logger.error(f"Error counting distinct hashtags: {str(e)}")
+        return 0
 
-        # Sort by engagement and limit results
-        return sorted(trending_hashtags, key=lambda x: x['avg_engagement'], reverse=True)[:limit]
+def iter_post_pages(days: int = 30, page_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+    """Stream the raw posts of the last N days page by page, holding one page in memory at a time"""
+    return get_backend().iter_post_pages(days, page_size)
 
-    except Exception as e:
-        logger.error(f"Error fetching trending hashtags: {str(e)}")
-        return generate_mock_hashtags()
+def iter_posts(days: int = 30, page_size: int = 5000) -> Iterator[Dict[str, Any]]:
+    """Stream the raw posts of the last N days one at a time"""
+    for page in iter_post_pages(days, page_size):
+        yield from page
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss/stale counters of the shared analytics query cache"""
+    return analytics_cache.stats()
 
 def generate_mock_data() -> List[Dict[str, Any]]:
     """Generate mock data for testing"""
@@ -1,12 +1,158 @@
-from fastapi import FastAPI
-from insight_generator import generate_insights
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from insight_generator import agenerate_insights, astream_insights, get_insight_cache_stats
+from analytics import get_post_type_metrics, get_trending_hashtags, get_cache_stats, iter_post_pages
+from export import EXPORT_FORMATS, export_chunks, post_export_chunks, parquet_supported
+from change_feed import change_feed
+from query_cache import analytics_cache
+from db_connection import check_health, shutdown_astra_session
+from rollups import day_buckets
+from rule_insights import generate_rule_insights
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import json
 
 app = FastAPI()
 
+@app.on_event("startup")
+def start_change_feed():
+    # Drop cached query results as soon as new data lands instead of waiting out the TTL
+    change_feed.add_listener(lambda version: analytics_cache.invalidate())
+    change_feed.start()
+
+@app.on_event("shutdown")
+def close_database():
+    change_feed.stop()
+    shutdown_astra_session()
+
+# Requests currently being computed, shared by concurrent callers with the same key
+_inflight: Dict[Hashable, asyncio.Task] = {}
+_coalesce_stats = {'started': 0, 'coalesced': 0}
+
+async def coalesce(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """Run `factory` once per key while a previous call for that key is still running"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+        _coalesce_stats['started'] += 1
+    else:
+        _coalesce_stats['coalesced'] += 1
+    # Shield so one disconnecting client does not cancel the work other clients wait on
+    return await asyncio.shield(task)
+
+async def fetch_window(days: int, limit: int):
+    """Fetch the window's metrics and hashtags concurrently"""
+    return await asyncio.gather(
+        asyncio.to_thread(get_post_type_metrics, days),
+        asyncio.to_thread(get_trending_hashtags, limit, days)
+    )
+
+async def build_insights(days: int, limit: int) -> str:
+    """Generate insights for the window's metrics"""
+    metrics, hashtags = await fetch_window(days, limit)
+    return await agenerate_insights(metrics, hashtags)
+
 @app.get("/insights")
-async def get_insights():
-    return {"insights": generate_insights()}
+async def get_insights(days: int = 30, limit: int = 5):
+    insights = await coalesce(("insights", days, limit), lambda: build_insights(days, limit))
+    return {"insights": insights}
+
+@app.get("/insights/rules")
+async def get_rule_insights(days: int = 30, limit: int = 5):
+    """Structured insights computed from the metrics without calling the LLM"""
+    metrics, hashtags = await fetch_window(days, limit)
+    return generate_rule_insights(metrics, hashtags)
+
+@app.get("/insights/stream")
+async def stream_insights(days: int = 30, limit: int = 5):
+    metrics, hashtags = await fetch_window(days, limit)
+
+    async def events():
+        async for chunk in astream_insights(metrics, hashtags):
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def export_response(chunks, format: str, name: str, compress: bool) -> StreamingResponse:
+    """Stream encoded chunks as a file download"""
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{name}.{extension}" + (".gz" if compress else "")
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if compress else media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def check_export_format(format: str) -> None:
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}', expected one of {sorted(EXPORT_FORMATS)}")
+    if format == "parquet" and not parquet_supported():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+@app.get("/export/posts")
+def export_posts(format: str = "csv", days: int = 30, gzip: bool = False, page_size: int = 5000):
+    """Stream the raw posts of the window page by page, so memory stays at one page whatever the export size"""
+    check_export_format(format)
+    chunks = post_export_chunks(iter_post_pages(days, page_size), format, gzip)
+    return export_response(chunks, format, f"social_media_posts_{days}d", gzip)
+
+@app.get("/export/metrics")
+def export_metrics(format: str = "csv", days: int = 30, gzip: bool = False):
+    check_export_format(format)
+    metrics = get_post_type_metrics(days)
+    columns = list(metrics[0]) if metrics else []
+    return export_response(export_chunks(format, [metrics], columns, gzip), format, "social_media_metrics", gzip)
+
+@app.get("/export/hashtags")
+def export_hashtags(format: str = "csv", days: int = 30, limit: int = 5, gzip: bool = False):
+    check_export_format(format)
+    hashtags = get_trending_hashtags(limit, days)
+    columns = list(hashtags[0]) if hashtags else []
+    return export_response(export_chunks(format, [hashtags], columns, gzip), format, "hashtag_metrics", gzip)
+
+@app.get("/updates")
+async def updates():
+    """Server-sent events carrying the data version, sent on connect and whenever new data lands"""
+    async def events():
+        async for version in change_feed.subscribe():
+            yield f"event: update\ndata: {json.dumps({'version': version})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/updates")
+async def updates_socket(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        async for version in change_feed.subscribe():
+            await websocket.send_json({"version": version})
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/health")
+async def health():
+    status = await asyncio.to_thread(check_health)
+    return JSONResponse(status, status_code=200 if status['status'] == 'ok' else 503)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "analytics": get_cache_stats(),
+        "day_buckets": day_buckets.stats(),
+        "insights": get_insight_cache_stats(),
+        "coalescing": dict(_coalesce_stats, in_flight=len(_inflight))
+    }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,19 +1,147 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from analytics import get_post_type_metrics, get_trending_hashtags
-from insight_generator import generate_insights
-import pandas as pd
-import time
+from insight_generator import stream_insights
+from rule_insights import render_rule_insights
+from snapshot import SnapshotRefresher, RADAR_METRICS
+from change_feed import change_feed
+from metrics_history import metrics_history, HISTORY_COLUMNS
+from query_cache import analytics_cache
+from figure_cache import figure_cache
 import json
+import os
 from datetime import datetime
 import base64
 
-def create_download_link(df, filename):
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">Download CSV</a>'
-    return href
+# Exports are streamed by the FastAPI service instead of being embedded in the page
+API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:8000').rstrip('/')
+
+def create_download_links(path, **params):
+    """Links to the API export endpoint in every format"""
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    links = [
+        f'<a href="{API_BASE_URL}{path}?format={fmt}&{query}" download>{label}</a>'
+        for fmt, label in [("csv", "CSV"), ("ndjson", "NDJSON"), ("parquet", "Parquet")]
+    ]
+    links.append(f'<a href="{API_BASE_URL}{path}?format=csv&gzip=true&{query}" download>CSV (gzip)</a>')
+    return "Download: " + " · ".join(links)
+
+# Seconds between each session's check for a newer snapshot in live mode
+LIVE_CHECK_INTERVAL = 1
+
+@st.cache_resource
+def get_refresher():
+    # One refresher per server process, shared by every session
+    refresher = SnapshotRefresher().start()
+
+    def on_change(version):
+        # New data landed: drop cached query results and rebuild the snapshot right away
+        analytics_cache.invalidate()
+        refresher.request_refresh()
+
+    change_feed.add_listener(on_change)
+    change_feed.start()
+    return refresher
+
+def watch_for_updates():
+    """Rerun the page only once a newer snapshot has been published"""
+    snapshot = get_refresher().latest()
+    if snapshot is None:
+        return
+    st.caption(f"Data as of {snapshot['created_at']:%H:%M:%S}")
+    if snapshot['version'] != st.session_state.get('rendered_version'):
+        st.rerun()
+
+def build_performance_figure(df_metrics, metrics_to_show):
+    return px.bar(df_metrics,
+                  x='post_type',
+                  y=metrics_to_show,
+                  title="Average Engagement Metrics by Post Type",
+                  barmode='group')
+
+def build_funnel_figure(funnel_metrics):
+    fig = go.Figure(go.Funnel(
+        y=funnel_metrics['stage'],
+        x=funnel_metrics['count'],
+        textinfo="value+percent initial",
+        textposition="inside",
+        textfont=dict(size=14),
+        marker=dict(
+            color=["#1f77b4", "#2ca02c", "#ff7f0e", "#d62728", "#9467bd", "#8c564b"]
+        ),
+        connector={"line": {"color": "royalblue", "width": 3}}
+    ))
+
+    fig.update_layout(
+        title="Engagement Funnel Analysis",
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+def build_hashtag_figure(df_hashtags):
+    return px.bar(df_hashtags,
+                  x='hashtag',
+                  y='usage_count',
+                  title="Top Hashtags by Usage",
+                  color='avg_engagement',
+                  hover_data=['avg_engagement'])
+
+def build_reach_figure(df_metrics):
+    return px.scatter(df_metrics,
+                      x='avg_reach',
+                      y='avg_impressions',
+                      size='avg_engagement',
+                      color='post_type',
+                      title="Reach vs Impressions",
+                      hover_data=['total_posts'])
+
+def build_radar_figure(df_metrics, df_normalized):
+    # Normalized radar data is precomputed in the snapshot
+    metrics_to_compare = RADAR_METRICS
+    fig = go.Figure()
+
+    for idx, post_type in enumerate(df_metrics['post_type']):
+        fig.add_trace(go.Scatterpolar(
+            r=df_normalized.iloc[idx],
+            theta=[m.replace('avg_', '').title() for m in metrics_to_compare],
+            name=post_type.title(),
+            fill='toself',
+            line=dict(width=2)
+        ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100],
+                ticksuffix="%"
+            )
+        ),
+        showlegend=True,
+        title="Engagement Metrics Radar Chart (Normalized %)",
+        height=600,
+        legend=dict(
+            yanchor="top",
+            y=1.2,
+            xanchor="left",
+            x=1.1
+        )
+    )
+    return fig
+
+def build_correlation_figure(correlation):
+    return px.imshow(correlation,
+                     title="Metrics Correlation Matrix",
+                     color_continuous_scale='RdBu')
+
+def build_trend_figure(resolution, trend_metric):
+    return px.line(metrics_history.frame(resolution),
+                   x='timestamp',
+                   y=trend_metric,
+                   color='post_type',
+                   title=f"{trend_metric.replace('avg_', '').replace('_', ' ').title()} Over Time",
+                   markers=True)
 
 def main():
     st.set_page_config(page_title="Social Media Analytics Dashboard", layout="wide")
@@ -24,7 +152,11 @@ def main():
         st.title("📊 Social Media Analytics Dashboard")
     with col2:
         if st.button("🔄 Refresh Data"):
-            st.experimental_rerun()
+            refresher = get_refresher()
+            current = refresher.latest()
+            refresher.request_refresh()
+            refresher.wait(timeout=30, newer_than=current['version'] if current else 0)
+            st.rerun()
     
     st.markdown("---")
 
@@ -32,7 +164,7 @@ def main():
     st.sidebar.header("Filters & Controls")
     update_frequency = st.sidebar.selectbox(
         "Auto-refresh Interval",
-        ["Off", "30 seconds", "1 minute", "5 minutes"],
+        ["Off", "Live", "30 seconds", "1 minute", "5 minutes"],
         index=0
     )
     
@@ -41,30 +173,31 @@ def main():
         ["Overview", "Detailed Analysis", "Export"]
     )
 
-    # Initialize session state for real-time updates
-    if 'last_update' not in st.session_state:
-        st.session_state.last_update = datetime.now()
-        st.session_state.metrics_history = []
+    # Read the latest snapshot published by the background refresher; only the
+    # very first render of a fresh server waits for it
+    refresher = get_refresher()
+    snapshot = refresher.latest()
+    if snapshot is None:
+        with st.spinner("Fetching metrics..."):
+            snapshot = refresher.wait(timeout=60)
 
-    # Load data
-    with st.spinner("Fetching metrics..."):
-        metrics = get_post_type_metrics(30)
-        hashtags = get_trending_hashtags(5)
-        
-        if not metrics:
-            st.error("Unable to fetch metrics from the database. Please check your database connection.")
-            st.stop()
-            
-        df_metrics = pd.DataFrame(metrics)
-        df_hashtags = pd.DataFrame(hashtags) if hashtags else pd.DataFrame()
-        
-        # Store metrics history for trend analysis
-        st.session_state.metrics_history.append({
-            'timestamp': datetime.now(),
-            'metrics': metrics
-        })
-        if len(st.session_state.metrics_history) > 100:
-            st.session_state.metrics_history.pop(0)
+    if not snapshot or not snapshot['metrics']:
+        st.error("Unable to fetch metrics from the database. Please check your database connection.")
+        st.stop()
+
+    metrics = snapshot['metrics']
+    hashtags = snapshot['hashtags']
+    df_metrics = snapshot['df_metrics']
+    df_hashtags = snapshot['df_hashtags']
+
+    # Remember which snapshot this page shows so the update watcher can detect newer ones
+    version = snapshot['version']
+    st.session_state.rendered_version = version
+
+    # Only this small fragment reruns on the interval; the page reruns when new data is published
+    run_every = {"Off": None, "Live": LIVE_CHECK_INTERVAL, "30 seconds": 30, "1 minute": 60, "5 minutes": 300}
+    with st.sidebar:
+        st.fragment(watch_for_updates, run_every=run_every[update_frequency])()
 
     if view_mode == "Overview":
         # Main metrics cards
@@ -89,180 +222,110 @@ def main():
                 ['avg_likes', 'avg_comments', 'avg_shares'],
                 default=['avg_likes', 'avg_comments', 'avg_shares']
             )
-            fig1 = px.bar(df_metrics, 
-                         x='post_type', 
-                         y=metrics_to_show,
-                         title="Average Engagement Metrics by Post Type",
-                         barmode='group')
+            # Figures are rebuilt only when the snapshot or a chart's own controls change
+            fig1 = figure_cache.get("performance", version,
+                                    lambda: build_performance_figure(df_metrics, metrics_to_show),
+                                    metrics=metrics_to_show)
             st.plotly_chart(fig1, use_container_width=True)
 
             st.subheader("Engagement Funnel")
-            # Calculate funnel metrics
-            funnel_metrics = pd.DataFrame([{
-                'stage': 'Impressions',
-                'count': df_metrics['avg_impressions'].mean(),
-            }, {
-                'stage': 'Reach',
-                'count': df_metrics['avg_reach'].mean(),
-            }, {
-                'stage': 'Engagement',
-                'count': df_metrics['avg_likes'].mean() + df_metrics['avg_comments'].mean() + df_metrics['avg_shares'].mean(),
-            }, {
-                'stage': 'Likes',
-                'count': df_metrics['avg_likes'].mean(),
-            }, {
-                'stage': 'Comments',
-                'count': df_metrics['avg_comments'].mean(),
-            }, {
-                'stage': 'Shares',
-                'count': df_metrics['avg_shares'].mean(),
-            }])
-
-            fig2 = go.Figure(go.Funnel(
-                y=funnel_metrics['stage'],
-                x=funnel_metrics['count'],
-                textinfo="value+percent initial",
-                textposition="inside",
-                textfont=dict(size=14),
-                marker=dict(
-                    color=["#1f77b4", "#2ca02c", "#ff7f0e", "#d62728", "#9467bd", "#8c564b"]
-                ),
-                connector={"line": {"color": "royalblue", "width": 3}}
-            ))
-            
-            fig2.update_layout(
-                title="Engagement Funnel Analysis",
-                showlegend=False,
-                height=400
-            )
+            fig2 = figure_cache.get("funnel", version, lambda: build_funnel_figure(snapshot['funnel']))
             st.plotly_chart(fig2, use_container_width=True)
 
         with col2:
             st.subheader("Trending Hashtags")
-            fig3 = px.bar(df_hashtags,
-                         x='hashtag',
-                         y='usage_count',
-                         title="Top Hashtags by Usage",
-                         color='avg_engagement',
-                         hover_data=['avg_engagement'])
+            fig3 = figure_cache.get("hashtags", version, lambda: build_hashtag_figure(df_hashtags))
             st.plotly_chart(fig3, use_container_width=True)
 
             st.subheader("Reach vs Impressions")
-            fig4 = px.scatter(df_metrics,
-                            x='avg_reach',
-                            y='avg_impressions',
-                            size='avg_engagement',
-                            color='post_type',
-                            title="Reach vs Impressions",
-                            hover_data=['total_posts'])
+            fig4 = figure_cache.get("reach", version, lambda: build_reach_figure(df_metrics))
             st.plotly_chart(fig4, use_container_width=True)
 
     elif view_mode == "Detailed Analysis":
-        st.subheader("🤖 AI-Generated Insights")
-        
-        # Add a container for the insights with custom styling
+        st.subheader("📋 Insights")
+        # Derived from the metrics alone, so the panel renders instantly even when the LLM is slow or down
+        st.markdown(render_rule_insights(snapshot['rule_insights']))
+
+        st.subheader("🤖 AI Narrative")
         insights_container = st.container()
         with insights_container:
-            with st.spinner("Generating detailed analysis..."):
-                insights = generate_insights()
-                if insights:
-                    st.markdown("""
-                    <style>
-                        .detailed-insights h2 {
-                            color: #1f77b4;
-                            margin-top: 1.5em;
-                        }
-                        .detailed-insights ul {
-                            margin-bottom: 1em;
-                        }
-                    </style>
-                    """, unsafe_allow_html=True)
-                    st.markdown(f'<div class="detailed-insights">{insights}</div>', unsafe_allow_html=True)
-                else:
-                    st.error("Failed to generate insights. Please try again.")
+            if snapshot['insights']:
+                st.markdown(snapshot['insights'])
+            else:
+                if get_refresher().insights:
+                    st.caption("The AI narrative is generated in the background and appears once ready.")
+                if st.button("Generate AI narrative now"):
+                    # Render chunks as the model produces them instead of waiting for the full completion
+                    insights = st.write_stream(stream_insights(metrics, hashtags))
+                    if not insights:
+                        st.error("Failed to generate insights. Please try again.")
 
         st.markdown("---")
         st.subheader("Advanced Metrics")
         
         # Replace bar chart with radar/spider chart
         st.subheader("Engagement Metrics Comparison")
-        # Prepare data for radar chart
-        metrics_to_compare = ['avg_likes', 'avg_comments', 'avg_shares', 'avg_engagement', 'avg_reach', 'avg_impressions']
-        
-        # Normalize the data for better visualization
-        df_normalized = pd.DataFrame()
-        for metric in metrics_to_compare:
-            max_val = df_metrics[metric].max()
-            if max_val != 0:  # Avoid division by zero
-                df_normalized[metric] = df_metrics[metric] / max_val * 100
-            else:
-                df_normalized[metric] = df_metrics[metric]
-        
-        fig5 = go.Figure()
-        
-        for idx, post_type in enumerate(df_metrics['post_type']):
-            fig5.add_trace(go.Scatterpolar(
-                r=df_normalized.iloc[idx],
-                theta=[m.replace('avg_', '').title() for m in metrics_to_compare],
-                name=post_type.title(),
-                fill='toself',
-                line=dict(width=2)
-            ))
-        
-        fig5.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 100],
-                    ticksuffix="%"
-                )
-            ),
-            showlegend=True,
-            title="Engagement Metrics Radar Chart (Normalized %)",
-            height=600,
-            legend=dict(
-                yanchor="top",
-                y=1.2,
-                xanchor="left",
-                x=1.1
-            )
-        )
+        fig5 = figure_cache.get("radar", version, lambda: build_radar_figure(df_metrics, snapshot['radar']))
         st.plotly_chart(fig5, use_container_width=True)
 
         # Correlation Matrix
-        numeric_cols = df_metrics.select_dtypes(include=['float64', 'int64']).columns
-        correlation = df_metrics[numeric_cols].corr()
-        fig6 = px.imshow(correlation,
-                        title="Metrics Correlation Matrix",
-                        color_continuous_scale='RdBu')
+        fig6 = figure_cache.get("correlation", version, lambda: build_correlation_figure(snapshot['correlation']))
         st.plotly_chart(fig6, use_container_width=True)
 
+        # Trends read from the process-wide history recorded by the snapshot refresher
+        st.subheader("Performance Trends")
+        trend_cols = st.columns(2)
+        with trend_cols[0]:
+            trend_metric = st.selectbox("Trend Metric", HISTORY_COLUMNS, index=HISTORY_COLUMNS.index('avg_engagement'))
+        with trend_cols[1]:
+            resolution = st.selectbox("Resolution", ["raw", "1min", "1hour"])
+        # The history only grows when the refresher publishes, so the snapshot version keys it too
+        if not metrics_history.post_types():
+            st.info("Trend history builds up as the dashboard refreshes.")
+        else:
+            fig7 = figure_cache.get("trend", version, lambda: build_trend_figure(resolution, trend_metric),
+                                    resolution=resolution, metric=trend_metric)
+            st.plotly_chart(fig7, use_container_width=True)
+
     else:  # Export view
         st.subheader("Export Data")
         
         export_options = st.multiselect(
             "Select data to export",
-            ["Metrics", "Hashtags", "Insights"],
+            ["Metrics", "Hashtags", "Raw Posts", "Insights"],
             default=["Metrics", "Hashtags"]
         )
         
         if "Metrics" in export_options:
             st.markdown("### Metrics Data")
             st.dataframe(df_metrics.style.highlight_max(axis=0))
-            st.markdown(create_download_link(df_metrics, "social_media_metrics.csv"), unsafe_allow_html=True)
+            # Same window as the table above
+            st.markdown(create_download_links("/export/metrics", days=refresher.days), unsafe_allow_html=True)
             
         if "Hashtags" in export_options:
             st.markdown("### Hashtags Data")
             st.dataframe(df_hashtags)
-            st.markdown(create_download_link(df_hashtags, "hashtag_metrics.csv"), unsafe_allow_html=True)
+            st.markdown(create_download_links("/export/hashtags", days=refresher.days, limit=refresher.hashtag_limit),
+                        unsafe_allow_html=True)
+
+        if "Raw Posts" in export_options:
+            st.markdown("### Raw Post Data")
+            export_days = st.number_input("Days of posts", min_value=1, max_value=365, value=refresher.days)
+            st.markdown(create_download_links("/export/posts", days=export_days), unsafe_allow_html=True)
             
         if "Insights" in export_options:
-            insights = generate_insights()
-            st.markdown("### AI Insights")
-            st.markdown(insights)
+            st.markdown("### Insights")
+            st.markdown(render_rule_insights(snapshot['rule_insights']))
+            if snapshot['insights']:
+                st.markdown("### AI Narrative")
+                st.markdown(snapshot['insights'])
             
             # Export insights as JSON
-            insights_dict = {"timestamp": datetime.now().isoformat(), "insights": insights}
+            insights_dict = {
+                "timestamp": datetime.now().isoformat(),
+                "rule_insights": snapshot['rule_insights'],
+                "insights": snapshot['insights']
+            }
             insights_json = json.dumps(insights_dict, indent=2)
             b64 = base64.b64encode(insights_json.encode()).decode()
             st.markdown(
@@ -270,17 +333,5 @@ def main():
                 unsafe_allow_html=True
             )
 
-    # Auto-refresh logic
-    if update_frequency != "Off":
-        seconds = {"30 seconds": 30, "1 minute": 60, "5 minutes": 300}[update_frequency]
-        time_since_update = (datetime.now() - st.session_state.last_update).total_seconds()
-        
-        if time_since_update >= seconds:
-            st.session_state.last_update = datetime.now()
-            time.sleep(1)  # Small delay to prevent too frequent updates
-            st.experimental_rerun()
-        
-        st.sidebar.markdown(f"Next update in: {max(0, int(seconds - time_since_update))} seconds")
-
 if __name__ == "__main__":
     main() 
\ No newline at end of file
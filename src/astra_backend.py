@@ -0,0 +1,76 @@
+from db_connection import get_astra_session
+from aggregation import finalize_post_type_metrics, top_hashtags, PostTypeAggregator
+from rollups import fetch_post_type_rollups, fetch_hashtag_stats, fetch_hashtag_sketch, fetch_data_version
+from timeseries import iter_window_pages, list_post_types
+from token_scan import scan_post_type_metrics, scan_hashtag_stats
+from storage import AnalyticsBackend
+from typing import List, Dict, Any, Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AstraBackend(AnalyticsBackend):
+    """Analytics over Astra DB rollups, falling back to per-bucket raw reads"""
+
+    name = 'astra'
+
+    def _session(self):
+        session, _ = get_astra_session()
+        if not session:
+            raise ConnectionError("Failed to establish database connection")
+        return session
+
+    def post_type_metrics(self, days: int, percentiles: bool = False) -> List[Dict[str, Any]]:
+        session = self._session()
+
+        # Answer from the per-day rollups: about N small rows instead of every post.
+        # Rollups only hold sums, so percentiles always need the raw posts.
+        if not percentiles:
+            sums_by_type = fetch_post_type_rollups(session, days)
+            if sums_by_type:
+                return finalize_post_type_metrics(sums_by_type)
+            logger.info("No rollup data for window, falling back to per-bucket post reads")
+
+        if not list_post_types(session):
+            logger.info("Time-partitioned posts not populated, recomputing with a parallel token-range scan")
+            return scan_post_type_metrics(session, days, percentiles)
+
+        # Read only the (post_type, day) partitions that overlap the window, one page at a time
+        aggregator = PostTypeAggregator(percentiles=percentiles)
+        for page in iter_window_pages(session, days):
+            aggregator.add_page(page)
+
+        return aggregator.result()
+
+    def trending_hashtags(self, limit: int, days: int, approximate: bool = False) -> List[Dict[str, Any]]:
+        session = self._session()
+
+        # About one fixed-size sketch per day, independent of the number of hashtags
+        if approximate:
+            sketch = fetch_hashtag_sketch(session, days)
+            if sketch.total:
+                return sketch.top(limit)
+            logger.info("No hashtag sketches for window, falling back to exact hashtag stats")
+
+        # Merge the maintained per-day hashtag stats for the window
+        stats_by_tag = fetch_hashtag_stats(session, days)
+        if stats_by_tag:
+            return top_hashtags(stats_by_tag, limit)
+
+        logger.info("No hashtag stats for window, falling back to a parallel post_hashtags scan")
+        return scan_hashtag_stats(session, limit, days)
+
+    def distinct_hashtags(self, days: int, approximate: bool = False) -> int:
+        session = self._session()
+        if approximate:
+            sketch = fetch_hashtag_sketch(session, days)
+            if sketch.total:
+                return sketch.distinct_count()
+            logger.info("No hashtag sketches for window, falling back to exact hashtag stats")
+        return len(fetch_hashtag_stats(session, days))
+
+    def iter_post_pages(self, days: int, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+        return iter_window_pages(self._session(), days, fetch_size=page_size)
+
+    def data_version(self) -> int:
+        return fetch_data_version(self._session())
@@ -0,0 +1,210 @@
+from analytics import get_post_type_metrics, get_trending_hashtags
+from insight_generator import build_messages, messages_key, TEMPERATURE, MAX_TOKENS
+from insight_cache import insight_cache
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from typing import List, Dict, Any, Optional, Set, Tuple
+from datetime import datetime
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_INSIGHTS_CONCURRENCY', '8'))
+BATCH_MAX_RETRIES = int(os.getenv('BATCH_INSIGHTS_MAX_RETRIES', '6'))
+# Requests started per minute across all workers; 0 means no client-side limit
+BATCH_RPM = int(os.getenv('BATCH_INSIGHTS_RPM', '0'))
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def load_completed(path: str) -> Set[Tuple[str, int]]:
+    """Return the (account, days) pairs already written to `path`"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write leaves at most one partial trailing line
+                continue
+            completed.add((record['account'], record['days']))
+    return completed
+
+class RateLimiter:
+    """Spaces request starts to stay under a requests-per-minute budget and honours server back-off"""
+
+    def __init__(self, rpm: int = BATCH_RPM):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every worker back, e.g. after a 429 with Retry-After"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start, self._paused_until)
+            self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+class BatchInsightJob:
+    """Generate insights for many (account, window) pairs through a bounded async worker pool
+
+    Results are appended to a JSONL file as each job finishes, and jobs already
+    present in that file are skipped, so a rerun resumes after a crash.
+    """
+
+    def __init__(self, output_path: str, concurrency: int = BATCH_CONCURRENCY,
+                 max_retries: int = BATCH_MAX_RETRIES, rpm: int = BATCH_RPM, hashtag_limit: int = 5):
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.hashtag_limit = hashtag_limit
+        self.model = os.getenv('OPENAI_MODEL', 'gpt-4')
+        # Retries are handled here so they share the rate limiter; OPENAI_BASE_URL selects a stub server
+        self.client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+        self.limiter = RateLimiter(rpm)
+        self._windows: Dict[int, asyncio.Task] = {}
+        self._prompts: Dict[str, asyncio.Task] = {}
+        self.stats = {'completed': 0, 'skipped': 0, 'failed': 0, 'cached': 0, 'retries': 0}
+
+    def _window_data(self, days: int) -> asyncio.Task:
+        # Every account sharing a window shares one fetch
+        task = self._windows.get(days)
+        if task is None:
+            task = self._windows[days] = asyncio.ensure_future(asyncio.gather(
+                asyncio.to_thread(get_post_type_metrics, days),
+                asyncio.to_thread(get_trending_hashtags, self.hashtag_limit, days)
+            ))
+        return task
+
+    async def _complete(self, messages: List[Dict[str, str]]) -> str:
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS
+                )
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                # Exponential backoff with jitter, or the server's Retry-After when given
+                delay = _retry_after(e) or min(60.0, 2 ** attempt) * (0.5 + random.random())
+                if isinstance(e, RateLimitError):
+                    self.limiter.pause(delay)
+                self.stats['retries'] += 1
+                logger.warning(f"{type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                await asyncio.sleep(delay)
+
+    async def _insights(self, messages: List[Dict[str, str]], key: str) -> str:
+        generated = False
+
+        async def complete() -> str:
+            nonlocal generated
+            generated = True
+            return await self._complete(messages)
+
+        insights = await insight_cache.aget_or_generate(key, complete)
+        if not generated:
+            self.stats['cached'] += 1
+        return insights
+
+    async def _run_job(self, account: str, days: int) -> Dict[str, Any]:
+        metrics, hashtags = await self._window_data(days)
+        messages = build_messages(metrics, hashtags)
+        key = insight_cache.make_key(messages_key(messages), self.model, TEMPERATURE)
+
+        # Jobs with identical prompts wait on one request instead of racing past the cache
+        task = self._prompts.get(key)
+        if task is None or (task.done() and task.exception() is not None):
+            task = self._prompts[key] = asyncio.ensure_future(self._insights(messages, key))
+        insights = await asyncio.shield(task)
+
+        return {
+            'account': account,
+            'days': days,
+            'model': self.model,
+            'generated_at': datetime.now().isoformat(),
+            'insights': insights
+        }
+
+    async def run(self, jobs: List[Tuple[str, int]]) -> Dict[str, Any]:
+        """Process every job not already in the output file and return counters"""
+        started = time.perf_counter()
+        completed = load_completed(self.output_path)
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            if job in completed:
+                self.stats['skipped'] += 1
+            else:
+                queue.put_nowait(job)
+
+        with open(self.output_path, 'a') as output:
+            async def worker():
+                while True:
+                    try:
+                        account, days = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        record = await self._run_job(account, days)
+                    except Exception as e:
+                        self.stats['failed'] += 1
+                        logger.error(f"Failed insights for {account} / {days}d: {str(e)}")
+                        continue
+                    # One line per finished job, flushed so a crash keeps everything before it
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    self.stats['completed'] += 1
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        return dict(self.stats, seconds=round(time.perf_counter() - started, 2))
+
+def main():
+    """Generate insights for every account x window combination"""
+    parser = argparse.ArgumentParser(description="Batch insight generation across accounts and windows")
+    parser.add_argument("--accounts", required=True, help="comma-separated account names")
+    parser.add_argument("--windows", default="7,30,90", help="comma-separated window lengths in days")
+    parser.add_argument("--output", default="batch_insights.jsonl", help="JSONL results file, resumed if present")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="concurrent LLM requests")
+    parser.add_argument("--max-retries", type=int, default=BATCH_MAX_RETRIES, help="retries per request")
+    parser.add_argument("--rpm", type=int, default=BATCH_RPM, help="max requests per minute, 0 for no limit")
+    args = parser.parse_args()
+
+    accounts = [account.strip() for account in args.accounts.split(",") if account.strip()]
+    windows = [int(days) for days in args.windows.split(",")]
+    jobs = list(itertools.product(accounts, windows))
+
+    job = BatchInsightJob(args.output, args.concurrency, args.max_retries, args.rpm)
+    report = asyncio.run(job.run(jobs))
+    print(f"{report['completed']} completed, {report['skipped']} already done, {report['failed']} failed "
+          f"({report['cached']} from cache, {report['retries']} retries) in {report['seconds']}s")
+
+if __name__ == "__main__":
+    main()
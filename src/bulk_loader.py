@@ -0,0 +1,205 @@
+from db_connection import get_astra_session, prepare, shutdown_astra_session
+from aggregation import add_post, add_hashtag
+from rollups import (
+    rollup_day, day_buckets, UPDATE_POST_TYPE_ROLLUP, UPDATE_HASHTAG_STATS, INSERT_HASHTAG_SKETCH,
+    UPDATE_DAY_VERSION, post_type_rollup_values, hashtag_stats_values, hashtag_sketch_values,
+    day_version_values, bump_data_version, replace_hashtag_sketches, compact_closed_hashtag_sketches
+)
+from sketches import HashtagSketch
+from timeseries import INSERT_POST_BY_DAY, INSERT_POST_TYPE, post_by_day_values
+from synthetic_data import generate_posts
+from cassandra.concurrent import execute_concurrent
+from cassandra.query import BatchStatement, BatchType
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+import argparse
+import itertools
+import logging
+import time
+import uuid
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INSERT_POST = """
+INSERT INTO social_media_posts (
+    id, post_type, content, created_at, likes, comments, shares,
+    reach, impressions, engagement, click_through_rate, watch_time
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_POST_HASHTAG = "INSERT INTO post_hashtags (post_id, hashtag, created_at, engagement) VALUES (?, ?, ?, ?)"
+
+POST_COLUMNS = [
+    'id', 'post_type', 'content', 'created_at', 'likes', 'comments', 'shares',
+    'reach', 'impressions', 'engagement', 'click_through_rate', 'watch_time'
+]
+
+class BulkLoader:
+    """Pipelined writer for posts, hashtags and their rollups"""
+
+    def __init__(self, session, concurrency: int = 128, batch_size: int = 20, chunk_size: int = 5000):
+        self.session = session
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.insert_post = prepare(session, INSERT_POST)
+        self.insert_post_by_day = prepare(session, INSERT_POST_BY_DAY)
+        self.insert_post_hashtag = prepare(session, INSERT_POST_HASHTAG)
+        self.update_post_type_rollup = prepare(session, UPDATE_POST_TYPE_ROLLUP)
+        self.update_hashtag_stats = prepare(session, UPDATE_HASHTAG_STATS)
+        self.insert_hashtag_sketch = prepare(session, INSERT_HASHTAG_SKETCH)
+        self.insert_post_type = prepare(session, INSERT_POST_TYPE)
+        self.update_day_version = prepare(session, UPDATE_DAY_VERSION)
+        # The partial sketch this load last wrote for each day, with its id
+        self.day_sketches: Dict[Any, Tuple[uuid.UUID, HashtagSketch]] = {}
+        self.rows_written = 0
+        self.posts_written = 0
+
+    def _unlogged_batches(self, statement, rows_by_partition: Dict[Any, List[tuple]]) -> Iterator[tuple]:
+        # Every batch targets a single partition, so it is applied as one mutation
+        for rows in rows_by_partition.values():
+            for start in range(0, len(rows), self.batch_size):
+                batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+                for values in rows[start:start + self.batch_size]:
+                    batch.add(statement, values)
+                yield batch, None
+
+    def _run(self, statements: Iterable[tuple]) -> int:
+        # execute_concurrent keeps at most `concurrency` requests in flight
+        executed = 0
+        for _ in execute_concurrent(self.session, statements, concurrency=self.concurrency,
+                                    raise_on_first_error=True, results_generator=True):
+            executed += 1
+        return executed
+
+    def _load_chunk(self, posts: List[Dict[str, Any]]) -> None:
+        posts_by_bucket: Dict[tuple, List[tuple]] = {}
+        hashtags_by_post: Dict[Any, List[tuple]] = {}
+        post_type_sums: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+        hashtag_stats: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+        hashtag_sketches: Dict[Any, HashtagSketch] = {}
+        post_types = set()
+
+        for post in posts:
+            day = rollup_day(post['created_at'])
+            posts_by_bucket.setdefault((post['post_type'], day), []).append(post_by_day_values(post))
+            add_post(post_type_sums.setdefault(day, {}), post)
+            post_types.add(post['post_type'])
+            for hashtag in post.get('hashtags', []):
+                hashtags_by_post.setdefault(post['id'], []).append(
+                    (post['id'], hashtag, post['created_at'], post['engagement'])
+                )
+                add_hashtag(hashtag_stats.setdefault(day, {}), hashtag, 1, post['engagement'] or 0)
+                sketch = hashtag_sketches.get(day)
+                if sketch is None:
+                    sketch = hashtag_sketches[day] = HashtagSketch()
+                sketch.add(hashtag, post['engagement'] or 0)
+
+        raw_posts = ((self.insert_post, tuple(post.get(c) for c in POST_COLUMNS)) for post in posts)
+        self._run(itertools.chain(
+            raw_posts,
+            self._unlogged_batches(self.insert_post_by_day, posts_by_bucket),
+            self._unlogged_batches(self.insert_post_hashtag, hashtags_by_post)
+        ))
+
+        # Counters are pre-aggregated per chunk: one increment per (day, key) instead of per row
+        rollup_updates = (
+            (self.update_post_type_rollup, post_type_rollup_values(day, post_type, sums))
+            for day, sums_by_type in post_type_sums.items()
+            for post_type, sums in sums_by_type.items()
+        )
+        hashtag_updates = (
+            (self.update_hashtag_stats,
+             hashtag_stats_values(day, hashtag, stats['usage_count'], stats['total_engagement']))
+            for day, stats_by_tag in hashtag_stats.items()
+            for hashtag, stats in stats_by_tag.items()
+        )
+        # A day keeps one partial per load: each chunk replaces it with the merged sketch
+        sketch_inserts = []
+        sketch_swaps = []
+        for day, sketch in hashtag_sketches.items():
+            previous = self.day_sketches.get(day)
+            if previous is None:
+                values = hashtag_sketch_values(day, sketch)
+                sketch_inserts.append((self.insert_hashtag_sketch, values))
+                self.day_sketches[day] = (values[1], sketch)
+                continue
+            # The previous sketch is dropped either way: replaced by the merge, or already compacted
+            merged = previous[1]
+            merged.merge(sketch)
+            batch, sketch_id = replace_hashtag_sketches(self.session, day, merged, [previous[0]])
+            sketch_swaps.append((day, sketch, sketch_id, merged, self.session.execute_async(batch)))
+        type_inserts = ((self.insert_post_type, (post_type,)) for post_type in post_types)
+        self._run(itertools.chain(rollup_updates, hashtag_updates, sketch_inserts, type_inserts))
+        for day, sketch, sketch_id, merged, future in sketch_swaps:
+            if future.result().was_applied:
+                self.day_sketches[day] = (sketch_id, merged)
+            else:
+                # A compaction already folded the previous partial in, so only this chunk is left to write
+                values = hashtag_sketch_values(day, sketch)
+                self.session.execute(self.insert_hashtag_sketch, values)
+                self.day_sketches[day] = (values[1], sketch)
+        # Backdated posts change days that readers may have cached as closed; only those days
+        # are re-read, in this process and in others through their day versions
+        day_buckets.invalidate(post_type_sums.keys())
+        self._run((self.update_day_version, day_version_values(day)) for day in post_type_sums)
+        # Only after the rollups are written, so readers woken by the change feed see this chunk
+        bump_data_version(self.session)
+
+        self.posts_written += len(posts)
+        self.rows_written += 2 * len(posts) + sum(len(rows) for rows in hashtags_by_post.values())
+
+    def load(self, posts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Write posts (with optional 'hashtags' lists) and report throughput"""
+        started = time.perf_counter()
+        iterator = iter(posts)
+        while True:
+            chunk = list(itertools.islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+            self._load_chunk(chunk)
+            elapsed = time.perf_counter() - started
+            logger.info(f"Loaded {self.posts_written} posts ({self.rows_written / elapsed:.0f} rows/sec)")
+
+        # Fold the partials of every load into one sketch per closed day
+        compacted = compact_closed_hashtag_sketches(self.session, self.day_sketches)
+        self.day_sketches = {}
+        if compacted:
+            logger.info(f"Compacted {compacted} partial hashtag sketches")
+
+        elapsed = time.perf_counter() - started
+        return {
+            'posts': self.posts_written,
+            'rows': self.rows_written,
+            'seconds': round(elapsed, 2),
+            'rows_per_sec': round(self.rows_written / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+def main():
+    """Generate synthetic posts and bulk load them"""
+    parser = argparse.ArgumentParser(description="Bulk load synthetic social media posts")
+    parser.add_argument("--posts", type=int, default=100000, help="number of posts to generate")
+    parser.add_argument("--days", type=int, default=30, help="spread posts over the last N days")
+    parser.add_argument("--concurrency", type=int, default=128, help="max requests in flight")
+    parser.add_argument("--batch-size", type=int, default=20, help="rows per single-partition unlogged batch")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="posts grouped per partition pass")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    args = parser.parse_args()
+
+    session, _ = get_astra_session()
+    if not session:
+        logger.error("Failed to establish database connection")
+        return
+
+    try:
+        loader = BulkLoader(session, concurrency=args.concurrency, batch_size=args.batch_size,
+                            chunk_size=args.chunk_size)
+        report = loader.load(generate_posts(args.posts, days=args.days, seed=args.seed))
+        print(f"Loaded {report['posts']} posts / {report['rows']} rows in {report['seconds']}s "
+              f"({report['rows_per_sec']} rows/sec)")
+    except Exception as e:
+        logger.error(f"Error bulk loading posts: {str(e)}")
+    finally:
+        shutdown_astra_session()
+
+if __name__ == "__main__":
+    main()
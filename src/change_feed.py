@@ -0,0 +1,118 @@
+from storage import get_backend
+from typing import Callable, List, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reads of the backend's data version; each read is a single small row
+CHANGE_POLL_INTERVAL = float(os.getenv('CHANGE_POLL_INTERVAL', '1'))
+
+# Longest pause between polls while the backend is unreachable
+CHANGE_POLL_MAX_BACKOFF = float(os.getenv('CHANGE_POLL_MAX_BACKOFF', '30'))
+
+class ChangeFeed:
+    """Process-wide notifications that new analytics data has been written
+
+    Writers bump a data version in the backend; one poller per process turns
+    version changes into callbacks, thread wake-ups and asyncio queue messages,
+    so any number of sessions or connections share a single cheap poll.
+    """
+
+    def __init__(self, poll_interval: float = CHANGE_POLL_INTERVAL, max_backoff: float = CHANGE_POLL_MAX_BACKOFF):
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.version = 0
+        self._changed = threading.Condition()
+        self._listeners: List[Callable[[int], None]] = []
+        self._queues: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, version: Optional[int] = None) -> None:
+        """Announce new data to every subscriber in this process"""
+        with self._changed:
+            self.version = version if version is not None else self.version + 1
+            version = self.version
+            listeners = list(self._listeners)
+            queues = list(self._queues)
+            self._changed.notify_all()
+
+        for listener in listeners:
+            try:
+                listener(version)
+            except Exception as e:
+                logger.error(f"Error in change feed listener: {str(e)}")
+        for loop, queue in queues:
+            loop.call_soon_threadsafe(queue.put_nowait, version)
+
+    def add_listener(self, listener: Callable[[int], None]) -> None:
+        """Call `listener(version)` from the poller thread whenever data changes"""
+        with self._changed:
+            self._listeners.append(listener)
+
+    def wait(self, newer_than: int, timeout: Optional[float] = None) -> int:
+        """Block until the version moves past `newer_than` or `timeout` expires"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > newer_than, timeout)
+            return self.version
+
+    async def subscribe(self):
+        """Async iterator of data versions: the current one, then every change"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        entry = (loop, queue)
+        with self._changed:
+            self._queues.add(entry)
+            queue.put_nowait(self.version)
+        try:
+            while True:
+                version = await queue.get()
+                # Collapse a burst of changes into the latest version
+                while not queue.empty():
+                    version = queue.get_nowait()
+                yield version
+        finally:
+            with self._changed:
+                self._queues.discard(entry)
+
+    def poll(self) -> None:
+        """Read the backend's data version once and publish if it moved"""
+        version = get_backend().data_version()
+        if version != self.version:
+            self.publish(version)
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+                if failures:
+                    logger.info(f"Data version polling recovered after {failures} failed attempts")
+                failures = 0
+            except Exception as e:
+                # Logged once per outage; the delay doubles until the backend answers again
+                if not failures:
+                    logger.error(f"Error polling data version: {str(e)}")
+                failures += 1
+            delay = min(self.poll_interval * 2 ** min(failures, 16), self.max_backoff) if failures else self.poll_interval
+            self._stopped.wait(delay)
+
+    def start(self) -> "ChangeFeed":
+        with self._changed:
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+# Shared by the API and the dashboard within one process
+change_feed = ChangeFeed()
@@ -0,0 +1,141 @@
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+from cassandra.auth import PlainTextAuthProvider
+from cassandra.policies import TokenAwarePolicy, DCAwareRoundRobinPolicy, ExponentialReconnectionPolicy
+from cassandra.query import dict_factory
+from dotenv import load_dotenv
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import atexit
+import logging
+import os
+import threading
+import time
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Process-wide connection state; every module shares one Cluster/Session
+_lock = threading.RLock()
+_cluster: Optional[Cluster] = None
+_session = None
+_prepared: Dict[str, Any] = {}
+_last_failure = 0.0
+
+# Seconds to wait after a failed connect before trying again, so an outage
+# does not turn every dashboard load into a multi-second TLS handshake
+RETRY_INTERVAL = float(os.getenv('ASTRA_RETRY_INTERVAL', '30'))
+
+def _build_cluster() -> Cluster:
+    token = os.getenv('ASTRA_DB_TOKEN')
+    bundle = os.getenv('ASTRA_SECURE_CONNECT_BUNDLE')
+    if not token or not bundle:
+        raise ValueError("Missing required environment variables: ASTRA_DB_TOKEN, ASTRA_SECURE_CONNECT_BUNDLE")
+
+    profile = ExecutionProfile(
+        load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+        request_timeout=float(os.getenv('ASTRA_REQUEST_TIMEOUT', '10')),
+        # Rows come back as dicts, which is what the analytics code reads
+        row_factory=dict_factory
+    )
+
+    # With protocol v3+ each host gets one multiplexed connection (thousands of
+    # streams), so the tunables are the I/O executor, timeouts and heartbeats
+    return Cluster(
+        cloud={'secure_connect_bundle': bundle},
+        auth_provider=PlainTextAuthProvider('token', token),
+        execution_profiles={EXEC_PROFILE_DEFAULT: profile},
+        executor_threads=int(os.getenv('ASTRA_EXECUTOR_THREADS', '4')),
+        connect_timeout=float(os.getenv('ASTRA_CONNECT_TIMEOUT', '10')),
+        control_connection_timeout=float(os.getenv('ASTRA_CONNECT_TIMEOUT', '10')),
+        idle_heartbeat_interval=30,
+        reconnection_policy=ExponentialReconnectionPolicy(base_delay=1.0, max_delay=60.0)
+    )
+
+def get_astra_session() -> Tuple[Any, Optional[Cluster]]:
+    """Get the shared Astra DB session, connecting on first use"""
+    global _cluster, _session, _last_failure
+
+    if _session is not None:
+        return _session, _cluster
+
+    with _lock:
+        if _session is not None:
+            return _session, _cluster
+        if _last_failure and time.monotonic() - _last_failure < RETRY_INTERVAL:
+            return None, None
+
+        try:
+            cluster = _build_cluster()
+            session = cluster.connect(os.getenv('ASTRA_DB_KEYSPACE', 'social_media_analytics'))
+            session.default_fetch_size = int(os.getenv('ASTRA_FETCH_SIZE', '5000'))
+            _cluster, _session = cluster, session
+            logger.info("Connected to Astra DB")
+            return _session, _cluster
+        except Exception as e:
+            _last_failure = time.monotonic()
+            logger.error(f"Error connecting to Astra DB: {str(e)}")
+            return None, None
+
+def prepare(session, query: str):
+    """Return a prepared statement for `query`, preparing it once per process"""
+    statement = _prepared.get(query)
+    if statement is None:
+        with _lock:
+            statement = _prepared.get(query)
+            if statement is None:
+                statement = _prepared[query] = session.prepare(query)
+    return statement
+
+def iter_statement_pages(session, query: str, parameters: tuple = (), fetch_size: Optional[int] = None,
+                         paging_state: Optional[bytes] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yield one page of rows at a time, following the driver's paging state"""
+    while True:
+        statement = prepare(session, query).bind(parameters)
+        statement.fetch_size = fetch_size or session.default_fetch_size
+        # Passing the paging state explicitly means only the current page is ever held in memory
+        result = session.execute(statement, paging_state=paging_state)
+        yield result.current_rows
+        paging_state = result.paging_state
+        if not paging_state:
+            return
+
+def execute_schema(session, query: str) -> bool:
+    """Execute a schema statement"""
+    try:
+        session.execute(query)
+        return True
+    except Exception as e:
+        logger.error(f"Error executing schema statement: {str(e)}")
+        return False
+
+def check_health() -> Dict[str, Any]:
+    """Probe the database with a lightweight query"""
+    session, cluster = get_astra_session()
+    if not session:
+        return {'status': 'unavailable'}
+
+    try:
+        started = time.perf_counter()
+        session.execute("SELECT release_version FROM system.local")
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        hosts_up = sum(1 for host in cluster.metadata.all_hosts() if host.is_up)
+        return {'status': 'ok', 'latency_ms': latency_ms, 'hosts_up': hosts_up}
+    except Exception as e:
+        return {'status': 'error', 'error': str(e)}
+
+def shutdown_astra_session() -> None:
+    """Close the shared session and cluster"""
+    global _cluster, _session
+
+    with _lock:
+        cluster = _cluster
+        _cluster, _session = None, None
+        _prepared.clear()
+
+    if cluster is not None:
+        cluster.shutdown()
+        logger.info("Closed Astra DB connection")
+
+# Streamlit has no shutdown callback, so rely on interpreter exit there
+atexit.register(shutdown_astra_session)
@@ -0,0 +1,146 @@
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence
+from datetime import datetime
+import csv
+import io
+import json
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+POST_EXPORT_COLUMNS = [
+    'id', 'post_type', 'content', 'created_at', 'likes', 'comments', 'shares',
+    'reach', 'impressions', 'engagement', 'click_through_rate', 'watch_time'
+]
+
+def parquet_supported() -> bool:
+    return pa is not None
+
+def post_arrow_schema():
+    return pa.schema([
+        ('id', pa.string()),
+        ('post_type', pa.string()),
+        ('content', pa.string()),
+        ('created_at', pa.timestamp('us')),
+        ('likes', pa.int64()),
+        ('comments', pa.int64()),
+        ('shares', pa.int64()),
+        ('reach', pa.int64()),
+        ('impressions', pa.int64()),
+        ('engagement', pa.float64()),
+        ('click_through_rate', pa.float64()),
+        ('watch_time', pa.float64())
+    ])
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def csv_chunks(pages: Iterable[Sequence[Dict[str, Any]]], columns: List[str]) -> Iterator[bytes]:
+    """Encode pages of rows as CSV, one chunk per page"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for page in pages:
+        for row in page:
+            writer.writerow([row.get(column) for column in columns])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Header-only output for an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def ndjson_chunks(pages: Iterable[Sequence[Dict[str, Any]]], columns: List[str]) -> Iterator[bytes]:
+    """Encode pages of rows as newline-delimited JSON, one chunk per page"""
+    for page in pages:
+        lines = [json.dumps({column: row.get(column) for column in columns}, default=_json_default)
+                 for row in page]
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the generator instead of keeping them"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def parquet_chunks(pages: Iterable[Sequence[Dict[str, Any]]], columns: List[str],
+                   schema: Optional["pa.Schema"] = None) -> Iterator[bytes]:
+    """Encode pages of rows as a Parquet file with one row group per page"""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+
+    sink = _ChunkSink()
+    writer = None
+    for page in pages:
+        if not page:
+            continue
+        batch = {column: [row.get(column) for row in page] for column in columns}
+        if schema is not None and 'id' in batch:
+            batch['id'] = [str(value) if value is not None else None for value in batch['id']]
+        table = pa.Table.from_pydict(batch, schema=schema)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression='snappy')
+        writer.write_table(table)
+        yield sink.drain()
+
+    if writer is None:
+        writer = pq.ParquetWriter(sink, schema or pa.schema([(column, pa.string()) for column in columns]))
+    writer.close()
+    yield sink.drain()
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_chunks(format: str, pages: Iterable[Sequence[Dict[str, Any]]], columns: List[str],
+                  compress: bool = False, schema: Optional["pa.Schema"] = None) -> Iterator[bytes]:
+    """Encode pages of rows in `format`, optionally gzip-compressed"""
+    if format == 'csv':
+        chunks = csv_chunks(pages, columns)
+    elif format == 'ndjson':
+        chunks = ndjson_chunks(pages, columns)
+    elif format == 'parquet':
+        chunks = parquet_chunks(pages, columns, schema)
+    else:
+        raise ValueError(f"Unknown export format '{format}', expected one of {sorted(EXPORT_FORMATS)}")
+    return gzip_chunks(chunks) if compress else chunks
+
+def post_export_chunks(pages: Iterable[Sequence[Dict[str, Any]]], format: str, compress: bool = False) -> Iterator[bytes]:
+    """Encode raw post pages with a fixed column order and Parquet schema"""
+    schema = post_arrow_schema() if format == 'parquet' and pa is not None else None
+    return export_chunks(format, pages, POST_EXPORT_COLUMNS, compress, schema)
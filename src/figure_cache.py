@@ -0,0 +1,46 @@
+from query_cache import QueryCache
+from typing import Any, Callable, Dict, Hashable
+import json
+import os
+import plotly.graph_objects as go
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable form of a chart parameter, e.g. a multiselect list"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+class FigureCache:
+    """Process-wide cache of serialized Plotly figures keyed by chart, data version and chart parameters
+
+    Figures are stored as JSON, so every render gets its own copy and sessions
+    never share a mutable figure. A new data version simply misses, and old
+    versions age out through LRU eviction and the TTL.
+
+    A hit skips both figure construction and Plotly's property validation,
+    which st.plotly_chart would otherwise repeat on every render of a dict.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._cache = QueryCache(ttl, maxsize)
+
+    def get(self, chart: str, version: Hashable, build: Callable[[], go.Figure], **params) -> go.Figure:
+        """Return the figure for `chart`, calling `build()` only on a miss"""
+        key = (chart, version, _freeze(params))
+        spec = self._cache.get_or_compute(key, lambda: build().to_json())
+        # The spec was validated when it was built
+        return go.Figure(json.loads(spec), _validate=False)
+
+    def invalidate(self) -> None:
+        self._cache.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+# Shared by every session of the dashboard process
+figure_cache = FigureCache(
+    ttl=float(os.getenv('FIGURE_CACHE_TTL', '3600')),
+    maxsize=int(os.getenv('FIGURE_CACHE_MAXSIZE', '64'))
+)
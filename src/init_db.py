@@ -1,4 +1,5 @@
-from db_connection import get_astra_session, execute_schema
+from db_connection import get_astra_session, execute_schema, shutdown_astra_session
+from bulk_loader import BulkLoader
 import logging
 from datetime import datetime, timedelta
 import uuid
@@ -44,6 +45,113 @@ def create_tables(session) -> bool:
             logger.error("Failed to create post_hashtags table")
             return False
 
+        # Create time-partitioned posts table so date-range reads hit only the buckets they need
+        posts_by_day_table = """
+        CREATE TABLE IF NOT EXISTS social_media_posts_by_day (
+            post_type text,
+            day date,
+            created_at timestamp,
+            id uuid,
+            content text,
+            likes int,
+            comments int,
+            shares int,
+            reach int,
+            impressions int,
+            engagement float,
+            click_through_rate float,
+            watch_time float,
+            PRIMARY KEY ((post_type, day), created_at, id)
+        ) WITH CLUSTERING ORDER BY (created_at DESC, id ASC)
+        """
+        if not execute_schema(session, posts_by_day_table):
+            logger.error("Failed to create social_media_posts_by_day table")
+            return False
+
+        # Create post type registry used to enumerate the (post_type, day) buckets
+        post_types_table = """
+        CREATE TABLE IF NOT EXISTS post_types (
+            post_type text PRIMARY KEY
+        )
+        """
+        if not execute_schema(session, post_types_table):
+            logger.error("Failed to create post_types table")
+            return False
+
+        # Create per-day, per-post_type rollup table (counters are kept up to date on write;
+        # float metrics are stored scaled by rollups.FLOAT_SCALE)
+        post_type_rollup_table = """
+        CREATE TABLE IF NOT EXISTS post_type_daily_rollup (
+            day date,
+            post_type text,
+            total_posts counter,
+            sum_likes counter,
+            sum_comments counter,
+            sum_shares counter,
+            sum_reach counter,
+            sum_impressions counter,
+            sum_engagement counter,
+            sum_click_through_rate counter,
+            sum_watch_time counter,
+            PRIMARY KEY (day, post_type)
+        )
+        """
+        if not execute_schema(session, post_type_rollup_table):
+            logger.error("Failed to create post_type_daily_rollup table")
+            return False
+
+        # Create per-day hashtag stats table used for the trending leaderboard
+        hashtag_stats_table = """
+        CREATE TABLE IF NOT EXISTS hashtag_daily_stats (
+            day date,
+            hashtag text,
+            usage_count counter,
+            total_engagement counter,
+            PRIMARY KEY (day, hashtag)
+        )
+        """
+        if not execute_schema(session, hashtag_stats_table):
+            logger.error("Failed to create hashtag_daily_stats table")
+            return False
+
+        # Create per-day hashtag sketches table used by the approximate analytics mode
+        hashtag_sketches_table = """
+        CREATE TABLE IF NOT EXISTS hashtag_sketches (
+            day date,
+            kind text,
+            id timeuuid,
+            payload blob,
+            PRIMARY KEY ((day, kind), id)
+        )
+        """
+        if not execute_schema(session, hashtag_sketches_table):
+            logger.error("Failed to create hashtag_sketches table")
+            return False
+
+        # Create the data version counter polled by the live-update change feed
+        data_versions_table = """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name text PRIMARY KEY,
+            version counter
+        )
+        """
+        if not execute_schema(session, data_versions_table):
+            logger.error("Failed to create data_versions table")
+            return False
+
+        # Create the per-day versions that tell readers which cached day buckets are stale
+        day_versions_table = """
+        CREATE TABLE IF NOT EXISTS day_versions (
+            name text,
+            day date,
+            version counter,
+            PRIMARY KEY (name, day)
+        )
+        """
+        if not execute_schema(session, day_versions_table):
+            logger.error("Failed to create day_versions table")
+            return False
+
         logger.info("Successfully created database tables")
         return True
 
@@ -67,52 +175,35 @@ def insert_sample_data(session) -> bool:
 
         # Generate posts for the last 30 days
         now = datetime.now()
+        posts = []
         for i in range(30):
             for post_type in post_types:
-                # Create post
-                post_id = uuid.uuid4()
                 created_at = now - timedelta(days=i, hours=i%24)
                 
                 # Add some randomness to metrics
                 metrics = base_metrics[post_type].copy()
                 engagement = (metrics['likes'] + metrics['comments'] * 2 + metrics['shares'] * 3) / 100
                 
-                post_query = """
-                INSERT INTO social_media_posts (
-                    id, post_type, content, created_at, likes, comments, shares,
-                    reach, impressions, engagement, click_through_rate, watch_time
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                
-                session.execute(post_query, (
-                    post_id,
-                    post_type,
-                    f"Sample {post_type} post content",
-                    created_at,
-                    metrics['likes'],
-                    metrics['comments'],
-                    metrics['shares'],
-                    metrics['likes'] * 10,  # reach
-                    metrics['likes'] * 12,  # impressions
-                    engagement,
-                    engagement * 0.3,  # click_through_rate
-                    45.0 if post_type == 'video' else 0.0  # watch_time
-                ))
-
-                # Add hashtags for this post
-                for hashtag in hashtags[:3]:  # Use first 3 hashtags for each post
-                    hashtag_query = """
-                    INSERT INTO post_hashtags (post_id, hashtag, created_at, engagement)
-                    VALUES (%s, %s, %s, %s)
-                    """
-                    session.execute(hashtag_query, (
-                        post_id,
-                        hashtag,
-                        created_at,
-                        engagement
-                    ))
-
-        logger.info("Successfully inserted sample data")
+                posts.append({
+                    'id': uuid.uuid4(),
+                    'post_type': post_type,
+                    'content': f"Sample {post_type} post content",
+                    'created_at': created_at,
+                    'likes': metrics['likes'],
+                    'comments': metrics['comments'],
+                    'shares': metrics['shares'],
+                    'reach': metrics['likes'] * 10,
+                    'impressions': metrics['likes'] * 12,
+                    'engagement': engagement,
+                    'click_through_rate': engagement * 0.3,
+                    'watch_time': 45.0 if post_type == 'video' else 0.0,
+                    'hashtags': hashtags[:3]  # Use first 3 hashtags for each post
+                })
+
+        # Writes posts, hashtags and rollups with pipelined, partition-grouped requests
+        report = BulkLoader(session).load(posts)
+
+        logger.info(f"Successfully inserted sample data ({report['rows']} rows)")
         return True
 
     except Exception as e:
@@ -123,7 +214,7 @@ def main():
     """Initialize the database with tables and sample data"""
     try:
         # Get database session
-        session, cluster = get_astra_session()
+        session, _ = get_astra_session()
         if not session:
             logger.error("Failed to establish database connection")
             return
@@ -144,8 +235,7 @@ def main():
         logger.error(f"Error initializing database: {str(e)}")
 
     finally:
-        if cluster:
-            cluster.shutdown()
+        shutdown_astra_session()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,131 @@
+from query_cache import QueryCache
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class InsightCache:
+    """Content-addressed cache of generated insights backed by SQLite"""
+
+    def __init__(self, path: str, ttl: float, memory_size: int = 64):
+        self.path = path
+        self.ttl = ttl
+        # In-memory front tier; also coalesces concurrent requests for the same prompt
+        self._memory = QueryCache(ttl=ttl, maxsize=memory_size)
+        self._lock = threading.Lock()
+        self._stats = {'disk_hits': 0, 'disk_stale': 0, 'generated': 0}
+        self._initialized = False
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float) -> str:
+        """Hash the inputs that determine a completion"""
+        payload = json.dumps({'prompt': prompt, 'model': model, 'temperature': temperature}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            with self._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS insights ("
+                    "key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                conn.commit()
+                self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored insight for `key` if it exists and has not expired"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT content, created_at FROM insights WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, created_at = row
+            if self.ttl > 0 and time.time() - created_at > self.ttl:
+                conn.execute("DELETE FROM insights WHERE key = ?", (key,))
+                conn.commit()
+                with self._lock:
+                    self._stats['disk_stale'] += 1
+                return None
+            with self._lock:
+                self._stats['disk_hits'] += 1
+            return content
+        finally:
+            conn.close()
+
+    def set(self, key: str, content: str) -> None:
+        """Store an insight under `key`"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO insights (key, content, created_at) VALUES (?, ?, ?)",
+                (key, content, time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_or_generate(self, key: str, generate: Callable[[], str]) -> str:
+        """Return the cached insight for `key`, calling `generate` at most once per process"""
+        def load_or_generate() -> str:
+            content = self.get(key)
+            if content is None:
+                content = generate()
+                self.set(key, content)
+                with self._lock:
+                    self._stats['generated'] += 1
+            return content
+
+        return self._memory.get_or_compute(key, load_or_generate)
+
+    async def aget_or_generate(self, key: str, agenerate: Callable[[], Awaitable[str]]) -> str:
+        """get_or_generate for coroutines: same tiers, counters and coalescing, without blocking the loop"""
+        loop = asyncio.get_running_loop()
+
+        def generate() -> str:
+            # The completion still runs on the caller's event loop; only the wait happens in the worker thread
+            return asyncio.run_coroutine_threadsafe(agenerate(), loop).result()
+
+        return await asyncio.to_thread(self.get_or_generate, key, generate)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the insight for `key` from memory or disk, counted as a request; for streamed completions"""
+        content = self._memory.get(key)
+        if content is None:
+            content = self.get(key)
+            if content is not None:
+                self._memory.set(key, content)
+        return content
+
+    def store(self, key: str, content: str) -> None:
+        """Store a completion generated outside get_or_generate, e.g. a finished stream"""
+        self.set(key, content)
+        self._memory.set(key, content)
+        with self._lock:
+            self._stats['generated'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return memory and disk hit counters"""
+        memory = self._memory.stats()
+        with self._lock:
+            stats = dict(self._stats)
+        stats['memory_hits'] = memory['hits']
+        stats['coalesced'] = memory['coalesced']
+        stats['memory_size'] = memory['size']
+        requests = memory['hits'] + memory['coalesced'] + memory['misses']
+        hits = memory['hits'] + memory['coalesced'] + stats['disk_hits']
+        stats['requests'] = requests
+        stats['hit_rate'] = round(hits / requests, 4) if requests else 0.0
+        stats['ttl'] = self.ttl
+        return stats
+
+insight_cache = InsightCache(
+    path=os.getenv('INSIGHT_CACHE_PATH', '.insight_cache.sqlite3'),
+    ttl=float(os.getenv('INSIGHT_CACHE_TTL', '86400'))
+)
@@ -1,28 +1,322 @@
 import os
-from openai import OpenAI
+import asyncio
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from insight_cache import insight_cache
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to a characters-per-token estimate
+    tiktoken = None
 
 load_dotenv()
 
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+# Upper bound on concurrent completions sent to the LLM from async callers
+llm_semaphore = asyncio.Semaphore(int(os.getenv('INSIGHTS_MAX_CONCURRENCY', '8')))
+
+SYSTEM_PROMPT = "You are a social media analytics expert who provides detailed, data-driven insights and recommendations."
+TEMPERATURE = 0.7
+MAX_TOKENS = 1500
+
+# 'compact' sends CSV tables under a token budget; 'verbose' keeps the original labelled prompt
+PROMPT_MODE = os.getenv('INSIGHT_PROMPT_MODE', 'compact')
+# Input tokens allowed for the per-request data in compact mode
+INSIGHT_TOKEN_BUDGET = int(os.getenv('INSIGHT_TOKEN_BUDGET', '600'))
+
+ANALYSIS_INSTRUCTIONS = """Please provide a comprehensive analysis in the following format:
+
+## 📊 Overall Performance Summary
+[Provide a concise summary of overall social media performance across all post types]
+
+## 📈 Content Performance Analysis
+[Analyze the effectiveness of different content types, including which types perform best and why]
+
+## 👥 Engagement Patterns
+[Detail user behavior insights and engagement patterns across different post types]
+
+## 🎯 Strategic Recommendations
+1. Content Strategy:
+   [Specific recommendations for content improvement]
+2. Posting Schedule:
+   [Best times to post based on engagement patterns]
+3. Hashtag Strategy:
+   [Recommendations for hashtag usage]
+4. Engagement Optimization:
+   [Tips for improving engagement across different metrics]
+
+## 🔍 Areas for Improvement
+[Identify specific areas that need attention and optimization]
+
+Format your analysis with proper markdown headings, bullet points, and emphasis where appropriate. Focus on actionable insights and data-driven recommendations."""
+
+# Identical for every request and sent first. Provider-side prompt caching only applies above a
+# minimum prompt size (1024 tokens on OpenAI), which this ~375-token prefix plus the budgeted data
+# does not reach by default; it is kept static so larger prompts or other providers can still reuse it
+COMPACT_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+
+The user message holds CSV tables. "metrics" has one row per post type with the number of posts and per-post averages; engagement and ctr are percentages and watch_time is in seconds. "hashtags" lists trending hashtags with their usage count and average engagement percentage. A row named "(other N)" aggregates the N least significant rows left out to fit the input budget.
+
+""" + ANALYSIS_INSTRUCTIONS
+
+# (column, metric key) pairs of the compact metrics table
+COMPACT_METRIC_COLUMNS = [
+    ('posts', 'total_posts'),
+    ('likes', 'avg_likes'),
+    ('comments', 'avg_comments'),
+    ('shares', 'avg_shares'),
+    ('engagement', 'avg_engagement'),
+    ('reach', 'avg_reach'),
+    ('impressions', 'avg_impressions'),
+    ('ctr', 'avg_ctr'),
+    ('watch_time', 'avg_watch_time')
+]
 
 def generate_insights(metrics, hashtags):
     """Generate insights using OpenAI API"""
     try:
-        prompt = construct_prompt(metrics, hashtags)
-        response = client.chat.completions.create(
-            model=os.getenv('OPENAI_MODEL', 'gpt-4'),
-            messages=[
-                {"role": "system", "content": "You are a social media analytics expert who provides detailed, data-driven insights and recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
-        return response.choices[0].message.content
+        messages = build_messages(metrics, hashtags)
+        model = os.getenv('OPENAI_MODEL', 'gpt-4')
+
+        def complete():
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS
+            )
+            return response.choices[0].message.content
+
+        # Identical metrics produce an identical prompt, so reuse the earlier completion
+        key = insight_cache.make_key(messages_key(messages), model, TEMPERATURE)
+        return insight_cache.get_or_generate(key, complete)
+    except Exception as e:
+        return f"Error generating insights: {str(e)}"
+
+async def agenerate_insights(metrics, hashtags):
+    """Generate insights without blocking the event loop"""
+    try:
+        messages = build_messages(metrics, hashtags)
+        model = os.getenv('OPENAI_MODEL', 'gpt-4')
+        key = insight_cache.make_key(messages_key(messages), model, TEMPERATURE)
+
+        async def complete():
+            async with llm_semaphore:
+                response = await async_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS
+                )
+            return response.choices[0].message.content
+
+        return await insight_cache.aget_or_generate(key, complete)
     except Exception as e:
         return f"Error generating insights: {str(e)}"
 
+def stream_insights(metrics, hashtags):
+    """Yield insight text chunks as they arrive from the model"""
+    try:
+        messages = build_messages(metrics, hashtags)
+        model = os.getenv('OPENAI_MODEL', 'gpt-4')
+        key = insight_cache.make_key(messages_key(messages), model, TEMPERATURE)
+
+        cached = insight_cache.lookup(key)
+        if cached is not None:
+            yield cached
+            return
+
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            stream=True
+        )
+        parts = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        # Only completed streams are cached; an abandoned generator never gets here
+        insight_cache.store(key, "".join(parts))
+    except Exception as e:
+        yield f"Error generating insights: {str(e)}"
+
+async def astream_insights(metrics, hashtags):
+    """Asynchronously yield insight text chunks as they arrive from the model"""
+    try:
+        messages = build_messages(metrics, hashtags)
+        model = os.getenv('OPENAI_MODEL', 'gpt-4')
+        key = insight_cache.make_key(messages_key(messages), model, TEMPERATURE)
+
+        cached = await asyncio.to_thread(insight_cache.lookup, key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        async with llm_semaphore:
+            stream = await async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+        await asyncio.to_thread(insight_cache.store, key, "".join(parts))
+    except Exception as e:
+        yield f"Error generating insights: {str(e)}"
+
+def get_insight_cache_stats():
+    """Get hit counters of the insight cache"""
+    return insight_cache.stats()
+
+def count_tokens(text, model=None):
+    """Count tokens with tiktoken when installed, otherwise estimate four characters per token"""
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    return len(_encoding(model or os.getenv('OPENAI_MODEL', 'gpt-4')).encode(text))
+
+_encodings = {}
+
+def _encoding(model):
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding('cl100k_base')
+        _encodings[model] = encoding
+    return encoding
+
+def _format_value(value):
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip('0').rstrip('.')
+    return str(value if value is not None else 0)
+
+def _csv_line(values):
+    return ",".join(_format_value(value) for value in values)
+
+def _other_metrics(rows):
+    """Merge post types into one row of post-weighted averages"""
+    posts = sum(row.get('total_posts') or 0 for row in rows)
+    merged = {'post_type': f"(other {len(rows)})", 'total_posts': posts}
+    for _, key in COMPACT_METRIC_COLUMNS[1:]:
+        weighted = sum((row.get(key) or 0) * (row.get('total_posts') or 0) for row in rows)
+        merged[key] = round(weighted / posts, 2) if posts else 0.0
+    return merged
+
+def _other_hashtags(rows):
+    """Merge hashtags into one row with total usage and usage-weighted engagement"""
+    uses = sum(row.get('usage_count') or 0 for row in rows)
+    weighted = sum((row.get('avg_engagement') or 0) * (row.get('usage_count') or 0) for row in rows)
+    return {'hashtag': f"(other {len(rows)})", 'usage_count': uses,
+            'avg_engagement': round(weighted / uses, 2) if uses else 0.0}
+
+def _min_rows_cost(rows, encode, merge, model):
+    """Fewest tokens a table body of `rows` can take: all rows, or one row summarizing them"""
+    if not rows:
+        return 0
+    everything = sum(count_tokens(encode(row), model) + 1 for row in rows)
+    return min(everything, count_tokens(encode(merge(rows)), model) + 1)
+
+def _fit_rows(rows, encode, merge, budget, model):
+    """Encode rows in order while they fit in `budget` tokens, folding the rest into one summary row
+
+    Returns the encoded lines and the tokens they use, which never exceed `budget`
+    as long as it covers _min_rows_cost.
+    """
+    lines = [encode(row) for row in rows]
+    costs = [count_tokens(line, model) + 1 for line in lines]
+    if sum(costs) <= budget:
+        return lines, sum(costs)
+
+    # Summarizing every row usually bounds the size of any summary row
+    reserve = count_tokens(encode(merge(rows)), model) + 1
+    kept, used = 0, 0
+    while kept < len(rows) and used + costs[kept] + reserve <= budget:
+        used += costs[kept]
+        kept += 1
+    while True:
+        summary = encode(merge(rows[kept:]))
+        summary_cost = count_tokens(summary, model) + 1
+        # A partial summary can still be longer (more digits); give back rows until it fits
+        if kept == 0 or used + summary_cost <= budget:
+            return lines[:kept] + [summary], used + summary_cost
+        kept -= 1
+        used -= costs[kept]
+
+def construct_compact_prompt(metrics, hashtags, budget=None, model=None):
+    """Encode metrics and hashtags as CSV tables that fit in `budget` input tokens
+
+    Post types are kept by post count and hashtags in the given (ranked) order;
+    the rows that do not fit are summarized in a single "(other N)" row. Raises
+    ValueError when `budget` is smaller than the headers plus those summary rows.
+    """
+    budget = INSIGHT_TOKEN_BUDGET if budget is None else budget
+    columns = COMPACT_METRIC_COLUMNS
+    if not any((metric.get('avg_watch_time') or 0) > 0 for metric in metrics):
+        columns = columns[:-1]
+
+    def encode_metric(row):
+        return _csv_line([row['post_type']] + [row.get(key) for _, key in columns])
+
+    def encode_hashtag(row):
+        return _csv_line([row['hashtag'], row.get('usage_count'), row.get('avg_engagement')])
+
+    metric_header = "metrics\npost_type," + ",".join(name for name, _ in columns)
+    hashtag_header = "hashtags\nhashtag,uses,engagement"
+    used = count_tokens(metric_header, model) + 1
+    if hashtags:
+        used += count_tokens(hashtag_header, model) + 2
+
+    ranked = sorted(metrics, key=lambda row: row.get('total_posts') or 0, reverse=True)
+    hashtags = list(hashtags or [])
+    metric_floor = _min_rows_cost(ranked, encode_metric, _other_metrics, model)
+    hashtag_floor = _min_rows_cost(hashtags, encode_hashtag, _other_hashtags, model)
+    if budget < used + metric_floor + hashtag_floor:
+        raise ValueError(f"Token budget {budget} is below the {used + metric_floor + hashtag_floor} tokens "
+                         f"the table headers and summary rows need")
+
+    # Post types may take two thirds of the budget when hashtags follow; hashtags get the rest,
+    # and each table keeps at least its summary row
+    remaining = budget - used
+    metric_budget = max(metric_floor, min(remaining * 2 // 3, remaining - hashtag_floor)) if hashtags else remaining
+    metric_lines, metric_tokens = _fit_rows(ranked, encode_metric, _other_metrics, metric_budget, model)
+    prompt = "\n".join([metric_header] + metric_lines)
+
+    if hashtags:
+        hashtag_lines, _ = _fit_rows(hashtags, encode_hashtag, _other_hashtags, remaining - metric_tokens, model)
+        prompt += "\n\n" + "\n".join([hashtag_header] + hashtag_lines)
+    return prompt
+
+def build_messages(metrics, hashtags, mode=None):
+    """Build the chat messages for an insight request in the configured prompt mode"""
+    if (mode or PROMPT_MODE) == 'verbose':
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": construct_prompt(metrics, hashtags)}
+        ]
+    return [
+        {"role": "system", "content": COMPACT_SYSTEM_PROMPT},
+        {"role": "user", "content": construct_compact_prompt(metrics, hashtags)}
+    ]
+
+def messages_key(messages):
+    """Text identifying a message list for the insight cache"""
+    return "\n\n".join(message['content'] for message in messages)
+
 def construct_prompt(metrics, hashtags):
     """Construct a detailed prompt for analysis"""
     prompt = "Analyze these social media metrics and provide detailed insights. Format your response in markdown with clear sections:\n\n"
@@ -50,39 +344,15 @@ def construct_prompt(metrics, hashtags):
         for tag in hashtags:
             prompt += f"\n- #{tag['hashtag']}: Used {tag['usage_count']} times, {tag['avg_engagement']}% engagement"
 
-    prompt += """
-
-Please provide a comprehensive analysis in the following format:
-
-## 📊 Overall Performance Summary
-[Provide a concise summary of overall social media performance across all post types]
-
-## 📈 Content Performance Analysis
-[Analyze the effectiveness of different content types, including which types perform best and why]
-
-## 👥 Engagement Patterns
-[Detail user behavior insights and engagement patterns across different post types]
-
-## 🎯 Strategic Recommendations
-1. Content Strategy:
-   [Specific recommendations for content improvement]
-2. Posting Schedule:
-   [Best times to post based on engagement patterns]
-3. Hashtag Strategy:
-   [Recommendations for hashtag usage]
-4. Engagement Optimization:
-   [Tips for improving engagement across different metrics]
-
-## 🔍 Areas for Improvement
-[Identify specific areas that need attention and optimization]
-
-Format your analysis with proper markdown headings, bullet points, and emphasis where appropriate. Focus on actionable insights and data-driven recommendations."""
+    prompt += "\n\n" + ANALYSIS_INSTRUCTIONS
 
     return prompt
 
 def test_insights():
+    from analytics import get_post_type_metrics, get_trending_hashtags
+
     print("\nGenerating insights from metrics...")
-    insights = generate_insights()
+    insights = generate_insights(get_post_type_metrics(30), get_trending_hashtags(5))
     print("\nINSIGHTS:")
     print(insights)
 
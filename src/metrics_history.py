@@ -0,0 +1,140 @@
+from aggregation import POST_METRIC_FIELDS
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from datetime import datetime
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# Numeric columns kept per post type
+HISTORY_COLUMNS = ['total_posts'] + [key for key, _ in POST_METRIC_FIELDS]
+
+# resolution -> (bucket seconds, rows kept); None keeps every recorded sample
+RESOLUTIONS = {
+    'raw': (None, int(os.getenv('HISTORY_RAW_POINTS', '720'))),
+    '1min': (60, int(os.getenv('HISTORY_MINUTE_POINTS', '1440'))),
+    '1hour': (3600, int(os.getenv('HISTORY_HOUR_POINTS', '2160')))
+}
+
+class RingBuffer:
+    """Fixed-capacity array of timestamped rows; appending past capacity overwrites the oldest row"""
+
+    def __init__(self, capacity: int, width: int):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, width), dtype=np.float64)
+        self.size = 0
+        self._next = 0
+
+    def append(self, timestamp: float, row: np.ndarray) -> None:
+        self.times[self._next] = timestamp
+        self.values[self._next] = row
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return copies of the stored timestamps and rows, oldest first"""
+        if self.size < self.capacity:
+            return self.times[:self.size].copy(), self.values[:self.size].copy()
+        order = np.r_[self._next:self.capacity, 0:self._next]
+        return self.times[order], self.values[order]
+
+class _DownsampledSeries:
+    """Ring buffer fed with per-bucket means; the open bucket is accumulated separately"""
+
+    def __init__(self, bucket_seconds: Optional[int], capacity: int, width: int):
+        self.bucket_seconds = bucket_seconds
+        self.ring = RingBuffer(capacity, width)
+        self._bucket: Optional[float] = None
+        self._sum = np.zeros(width, dtype=np.float64)
+        self._count = 0
+
+    def add(self, timestamp: float, row: np.ndarray) -> None:
+        if self.bucket_seconds is None:
+            self.ring.append(timestamp, row)
+            return
+
+        bucket = timestamp - timestamp % self.bucket_seconds
+        if self._bucket is not None and bucket != self._bucket:
+            self._flush()
+        self._bucket = bucket
+        self._sum += row
+        self._count += 1
+
+    def _flush(self) -> None:
+        if self._count:
+            self.ring.append(self._bucket, self._sum / self._count)
+        self._sum[:] = 0
+        self._count = 0
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        times, values = self.ring.ordered()
+        # Include the still-open bucket so the newest point is never missing
+        if self._count:
+            times = np.append(times, self._bucket)
+            values = np.vstack([values, self._sum / self._count])
+        return times, values
+
+class MetricsHistory:
+    """Process-wide post type metrics history at raw, per-minute and per-hour resolution
+
+    Memory is fixed per post type by the RESOLUTIONS capacities, however long
+    the process runs and however many sessions read it.
+    """
+
+    def __init__(self, columns: Sequence[str] = HISTORY_COLUMNS,
+                 resolutions: Dict[str, Tuple[Optional[int], int]] = RESOLUTIONS):
+        self.columns = list(columns)
+        self.resolutions = dict(resolutions)
+        self._series: Dict[str, Dict[str, _DownsampledSeries]] = {}
+        self._last_timestamp: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, timestamp: datetime, metrics: List[Dict[str, Any]]) -> None:
+        """Append one sample per post type; repeated or older timestamps are ignored"""
+        seconds = timestamp.timestamp()
+        with self._lock:
+            if self._last_timestamp is not None and seconds <= self._last_timestamp:
+                return
+            self._last_timestamp = seconds
+            for entry in metrics:
+                series = self._series.get(entry['post_type'])
+                if series is None:
+                    series = self._series[entry['post_type']] = {
+                        name: _DownsampledSeries(bucket, capacity, len(self.columns))
+                        for name, (bucket, capacity) in self.resolutions.items()
+                    }
+                row = np.array([entry.get(column) or 0 for column in self.columns], dtype=np.float64)
+                for resolution in series.values():
+                    resolution.add(seconds, row)
+
+    def post_types(self) -> List[str]:
+        with self._lock:
+            return sorted(self._series)
+
+    def frame(self, resolution: str = 'raw', post_types: Optional[Sequence[str]] = None,
+              since: Optional[datetime] = None) -> pd.DataFrame:
+        """Return the history as a long DataFrame with timestamp, post_type and metric columns"""
+        if resolution not in self.resolutions:
+            raise ValueError(f"Unknown resolution '{resolution}', expected one of {list(self.resolutions)}")
+
+        frames = []
+        with self._lock:
+            for post_type, series in self._series.items():
+                if post_types is not None and post_type not in post_types:
+                    continue
+                times, values = series[resolution].ordered()
+                if since is not None:
+                    keep = times >= since.timestamp()
+                    times, values = times[keep], values[keep]
+                frame = pd.DataFrame(values, columns=self.columns)
+                frame.insert(0, 'post_type', post_type)
+                frame.insert(0, 'timestamp', [datetime.fromtimestamp(seconds) for seconds in times])
+                frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=['timestamp', 'post_type'] + self.columns)
+        return pd.concat(frames, ignore_index=True)
+
+# Shared by every session of the dashboard process
+metrics_history = MetricsHistory()
@@ -0,0 +1,91 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+# Point the OpenAI clients at this server with OPENAI_BASE_URL=http://localhost:8001/v1
+STUB_LATENCY = float(os.getenv('OPENAI_STUB_LATENCY', '0.5'))
+# Fraction of requests answered with 429 and a Retry-After header
+STUB_RATE_LIMIT_RATE = float(os.getenv('OPENAI_STUB_RATE_LIMIT_RATE', '0'))
+STUB_RETRY_AFTER = float(os.getenv('OPENAI_STUB_RETRY_AFTER', '1'))
+
+app = FastAPI()
+stats = {'requests': 0, 'rate_limited': 0}
+
+def _reply(messages) -> str:
+    prompt = messages[-1]['content'] if messages else ''
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+    return (f"Stub insights for prompt {digest} ({len(prompt)} characters).\n\n"
+            "1. Performance Overview: engagement is stable across post types.\n"
+            "2. Key Recommendations: post more of the best performing type.")
+
+def _completion(model: str, content: str, prompt_chars: int) -> dict:
+    prompt_tokens = prompt_chars // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{stats['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+async def _stream(model: str, content: str):
+    created = int(time.time())
+    for word in content.split(' '):
+        chunk = {
+            "id": f"chatcmpl-stub-{stats['requests']}",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": word + ' '}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats['requests'] += 1
+
+    if random.random() < STUB_RATE_LIMIT_RATE:
+        stats['rate_limited'] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"Retry-After": str(STUB_RETRY_AFTER)}
+        )
+
+    await asyncio.sleep(STUB_LATENCY)
+    model = body.get('model', 'stub')
+    messages = body.get('messages', [])
+    content = _reply(messages)
+    if body.get('stream'):
+        return StreamingResponse(_stream(model, content), media_type="text/event-stream")
+    prompt_chars = sum(len(message.get('content') or '') for message in messages)
+    return _completion(model, content, prompt_chars)
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="OpenAI-compatible chat completions stub for local testing")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
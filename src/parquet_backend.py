@@ -0,0 +1,105 @@
+from aggregation import POST_METRIC_FIELDS, PostTypeAggregator, add_hashtag, top_hashtags, window_start
+from parquet_snapshot import MANIFEST, open_datasets
+from export import POST_EXPORT_COLUMNS
+from storage import AnalyticsBackend
+from typing import List, Dict, Any, Callable, Iterator
+import os
+import threading
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+class ParquetBackend(AnalyticsBackend):
+    """Analytics over a Parquet snapshot, read through memory-mapped files"""
+
+    name = 'parquet'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._opened_at = None
+        self._datasets()
+
+    def _manifest_mtime(self) -> int:
+        try:
+            return os.stat(os.path.join(self.path, MANIFEST)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _datasets(self, reopen: bool = False):
+        """Return the (posts, hashtags) datasets, relisting the files after a new dump"""
+        mtime = self._manifest_mtime()
+        with self._lock:
+            if reopen or mtime != self._opened_at:
+                self.posts, self.hashtags = open_datasets(self.path, memory_map=True)
+                self._opened_at = mtime
+            return self.posts, self.hashtags
+
+    def _read(self, read: Callable[[ds.Dataset, ds.Dataset], Any]) -> Any:
+        try:
+            return read(*self._datasets())
+        except FileNotFoundError:
+            # A dump replaced the files after they were listed; the manifest is written last,
+            # so the mtime may not have moved yet
+            return read(*self._datasets(reopen=True))
+
+    def _window(self, days: int):
+        start = window_start(days)
+        # The day predicate prunes whole partitions before any file is opened
+        return (ds.field('day') >= start.date()) & (ds.field('created_at') >= start)
+
+    def post_type_metrics(self, days: int, percentiles: bool = False) -> List[Dict[str, Any]]:
+        if percentiles:
+            aggregator = PostTypeAggregator(percentiles=True)
+            for page in self.iter_post_pages(days, 100000):
+                aggregator.add_page(page)
+            return aggregator.result()
+
+        columns = [column for _, column in POST_METRIC_FIELDS]
+        table = self._read(lambda posts, _: posts.to_table(columns=['post_type'] + columns,
+                                                         filter=self._window(days)))
+        # Missing metrics count as zero, as in the other backends
+        for column in columns:
+            table = table.set_column(table.schema.get_field_index(column), column, pc.fill_null(table[column], 0))
+
+        grouped = table.group_by('post_type').aggregate(
+            [('post_type', 'count')] + [(column, 'mean') for column in columns]
+        )
+        metrics = []
+        for row in grouped.to_pylist():
+            entry = {'post_type': row['post_type'], 'total_posts': row['post_type_count']}
+            for key, column in POST_METRIC_FIELDS:
+                entry[key] = round(row[f'{column}_mean'] or 0.0, 2)
+            metrics.append(entry)
+        return metrics
+
+    def _hashtag_table(self, days: int):
+        table = self._read(lambda _, hashtags: hashtags.to_table(columns=['hashtag', 'engagement'],
+                                                                filter=self._window(days)))
+        return table.filter(pc.not_equal(table['hashtag'], ''))
+
+    def trending_hashtags(self, limit: int, days: int, approximate: bool = False) -> List[Dict[str, Any]]:
+        # Columnar group-by over the window is already cheap, so approximate requests are answered exactly
+        grouped = self._hashtag_table(days).group_by('hashtag').aggregate(
+            [('hashtag', 'count'), ('engagement', 'sum')]
+        )
+        stats_by_tag = {}
+        for row in grouped.to_pylist():
+            add_hashtag(stats_by_tag, row['hashtag'], row['hashtag_count'], row['engagement_sum'] or 0)
+        return top_hashtags(stats_by_tag, limit)
+
+    def distinct_hashtags(self, days: int, approximate: bool = False) -> int:
+        return pc.count_distinct(self._hashtag_table(days)['hashtag']).as_py()
+
+    def iter_post_pages(self, days: int, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+        posts, _ = self._datasets()
+        for batch in posts.to_batches(columns=POST_EXPORT_COLUMNS, filter=self._window(days),
+                                      batch_size=page_size):
+            if batch.num_rows:
+                yield batch.to_pylist()
+
+    def data_version(self) -> int:
+        # A snapshot only changes when it is dumped again, which rewrites the manifest
+        try:
+            return int(os.path.getmtime(os.path.join(self.path, MANIFEST)))
+        except OSError:
+            return 0
@@ -0,0 +1,170 @@
+from export import POST_EXPORT_COLUMNS, post_arrow_schema
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence
+from datetime import datetime, date
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HASHTAG_COLUMNS = ['post_id', 'hashtag', 'created_at', 'engagement']
+
+POSTS_SCHEMA = post_arrow_schema().append(pa.field('day', pa.date32()))
+HASHTAGS_SCHEMA = pa.schema([
+    ('post_id', pa.string()),
+    ('hashtag', pa.string()),
+    ('created_at', pa.timestamp('us')),
+    ('engagement', pa.float64()),
+    ('day', pa.date32())
+])
+
+# Hive-style directories: posts/day=2024-01-31/post_type=video/part-0.parquet
+POSTS_PARTITIONING = ds.partitioning(pa.schema([('day', pa.date32()), ('post_type', pa.string())]), flavor='hive')
+HASHTAGS_PARTITIONING = ds.partitioning(pa.schema([('day', pa.date32())]), flavor='hive')
+
+MANIFEST = '_manifest.json'
+
+def _day(created_at: Optional[datetime]) -> Optional[date]:
+    return created_at.date() if created_at else None
+
+def _to_batch(page: Sequence[Dict[str, Any]], columns: List[str], schema: pa.Schema,
+              id_column: str) -> pa.RecordBatch:
+    data = {column: [row.get(column) for row in page] for column in columns}
+    data[id_column] = [str(value) if value is not None else None for value in data[id_column]]
+    data['day'] = [_day(row.get('created_at')) for row in page]
+    return pa.RecordBatch.from_pydict(data, schema=schema)
+
+def write_partitioned(pages: Iterable[Sequence[Dict[str, Any]]], base_dir: str, columns: List[str],
+                      schema: pa.Schema, partitioning: ds.Partitioning, id_column: str) -> int:
+    """Write pages of rows as a partitioned Parquet dataset and return the row count"""
+    written = 0
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        nonlocal written
+        for page in pages:
+            if page:
+                written += len(page)
+                yield _to_batch(page, columns, schema, id_column)
+
+    # A snapshot replaces the previous one entirely, including days that no longer exist
+    shutil.rmtree(base_dir, ignore_errors=True)
+    ds.write_dataset(
+        batches(), base_dir, schema=schema, format='parquet', partitioning=partitioning,
+        existing_data_behavior='overwrite_or_ignore', max_rows_per_group=100000
+    )
+    return written
+
+def dump_snapshot(session, out_dir: str, fetch_size: Optional[int] = None) -> Dict[str, Any]:
+    """Dump social_media_posts and post_hashtags to partitioned Parquet under `out_dir`"""
+    from db_connection import iter_statement_pages
+
+    started = time.perf_counter()
+    posts = write_partitioned(
+        iter_statement_pages(session, "SELECT * FROM social_media_posts", fetch_size=fetch_size),
+        os.path.join(out_dir, 'posts'), POST_EXPORT_COLUMNS, POSTS_SCHEMA, POSTS_PARTITIONING, 'id'
+    )
+    hashtags = write_partitioned(
+        iter_statement_pages(session, "SELECT * FROM post_hashtags", fetch_size=fetch_size),
+        os.path.join(out_dir, 'hashtags'), HASHTAG_COLUMNS, HASHTAGS_SCHEMA, HASHTAGS_PARTITIONING, 'post_id'
+    )
+
+    manifest = {'created_at': datetime.now().isoformat(), 'posts': posts, 'hashtags': hashtags}
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+    logger.info(f"Dumped {posts} posts and {hashtags} hashtags to {out_dir} "
+                f"in {time.perf_counter() - started:.2f}s")
+    return manifest
+
+def open_datasets(path: str, memory_map: bool = True):
+    """Open the posts and hashtags datasets of a snapshot, memory-mapping files by default"""
+    filesystem = pafs.LocalFileSystem(use_mmap=memory_map)
+    posts = ds.dataset(os.path.join(path, 'posts'), schema=POSTS_SCHEMA, format='parquet',
+                       partitioning=POSTS_PARTITIONING, filesystem=filesystem)
+    hashtags = ds.dataset(os.path.join(path, 'hashtags'), schema=HASHTAGS_SCHEMA, format='parquet',
+                          partitioning=HASHTAGS_PARTITIONING, filesystem=filesystem)
+    return posts, hashtags
+
+def iter_snapshot_posts(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the snapshot's posts with their 'hashtags' lists, one day partition at a time"""
+    posts, hashtags = open_datasets(path)
+    days = pc.unique(posts.to_table(columns=['day'])['day']).to_pylist()
+
+    for day in sorted(days, key=lambda value: (value is None, value)):
+        # Joining per day keeps memory bounded by the largest day, not the whole snapshot
+        in_day = ds.field('day').is_null() if day is None else ds.field('day') == day
+        tags_by_post: Dict[str, List[str]] = {}
+        for row in hashtags.to_table(columns=['post_id', 'hashtag'], filter=in_day).to_pylist():
+            tags_by_post.setdefault(row['post_id'], []).append(row['hashtag'])
+
+        for batch in posts.to_batches(filter=in_day):
+            for post in batch.to_pylist():
+                del post['day']
+                post['hashtags'] = tags_by_post.get(post['id'], [])
+                post['id'] = uuid.UUID(post['id'])
+                yield post
+
+def load_snapshot(path: str, target: str = 'astra', sqlite_path: Optional[str] = None) -> Dict[str, Any]:
+    """Reload a snapshot through the bulk loader (astra) or the embedded SQLite engine"""
+    started = time.perf_counter()
+    if target == 'sqlite':
+        from sqlite_backend import SQLiteBackend
+        backend = SQLiteBackend(sqlite_path or os.getenv('ANALYTICS_SQLITE_PATH', 'analytics.sqlite3'))
+        posts = backend.insert_posts(iter_snapshot_posts(path))
+        return {'posts': posts, 'seconds': round(time.perf_counter() - started, 2)}
+
+    from db_connection import get_astra_session
+    from bulk_loader import BulkLoader
+    session, _ = get_astra_session()
+    if not session:
+        raise ConnectionError("Failed to establish database connection")
+    return BulkLoader(session).load(iter_snapshot_posts(path))
+
+def main():
+    """Dump the analytics tables to Parquet or reload them from a snapshot"""
+    parser = argparse.ArgumentParser(description="Columnar snapshots of the analytics tables")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dump = commands.add_parser("dump", help="write social_media_posts and post_hashtags to Parquet")
+    dump.add_argument("--out", default="snapshot", help="snapshot directory")
+    dump.add_argument("--fetch-size", type=int, default=None, help="rows per page read from Astra DB")
+
+    load = commands.add_parser("load", help="reload a snapshot")
+    load.add_argument("--path", default="snapshot", help="snapshot directory")
+    load.add_argument("--target", choices=["astra", "sqlite"], default="astra", help="where to load the posts")
+    load.add_argument("--sqlite-path", default=None, help="database file for --target sqlite")
+    args = parser.parse_args()
+
+    if args.command == "load":
+        try:
+            report = load_snapshot(args.path, args.target, args.sqlite_path)
+            print(f"Loaded {report['posts']} posts in {report['seconds']}s")
+        finally:
+            if args.target == "astra":
+                from db_connection import shutdown_astra_session
+                shutdown_astra_session()
+        return
+
+    from db_connection import get_astra_session, shutdown_astra_session
+    session, _ = get_astra_session()
+    if not session:
+        logger.error("Failed to establish database connection")
+        return
+    try:
+        dump_snapshot(session, args.out, args.fetch_size)
+    except Exception as e:
+        logger.error(f"Error dumping snapshot: {str(e)}")
+    finally:
+        shutdown_astra_session()
+
+if __name__ == "__main__":
+    main()
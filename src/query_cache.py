@@ -0,0 +1,146 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+import copy
+import functools
+import inspect
+import os
+import threading
+import time
+
+class _InFlight:
+    """A computation other threads can wait on instead of repeating it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class QueryCache:
+    """Process-wide TTL cache with LRU eviction and single-flight deduplication"""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'coalesced': 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, computing it at most once across threads"""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return copy.deepcopy(value)
+                # Expired: drop it and recompute below (counted as a miss as well)
+                del self._entries[key]
+                self._stats['stale'] += 1
+
+            call = self._inflight.get(key)
+            if call is None:
+                call = self._inflight[key] = _InFlight()
+                leader = True
+                self._stats['misses'] += 1
+            else:
+                leader = False
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.value)
+
+        try:
+            call.value = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            with self._lock:
+                self._store(key, call.value)
+            return copy.deepcopy(call.value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        # Callers hold self._lock
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for `key`, or None, counting the lookup like get_or_compute"""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+                self._stats['stale'] += 1
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value computed outside get_or_compute"""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._store(key, copy.deepcopy(value))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/stale counters and current occupancy"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['maxsize'] = self.maxsize
+        stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = round((stats['hits'] + stats['coalesced']) / lookups, 4) if lookups else 0.0
+        return stats
+
+def cached_query(cache: QueryCache) -> Callable:
+    """Decorate a query function so calls with equal arguments share cached results"""
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Normalise positional/keyword/default arguments so f(5) and f(limit=5) share a key
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__qualname__, tuple(bound.arguments.items()))
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+analytics_cache = QueryCache(
+    ttl=float(os.getenv('ANALYTICS_CACHE_TTL', '30')),
+    maxsize=int(os.getenv('ANALYTICS_CACHE_MAXSIZE', '128'))
+)
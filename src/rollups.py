@@ -0,0 +1,449 @@
+from db_connection import get_astra_session, prepare, shutdown_astra_session
+from aggregation import POST_METRIC_FIELDS, window_days, empty_post_type_sums, add_post, add_hashtag, merge_post_type_sums
+from token_scan import parallel_scan
+from sketches import HashtagSketch
+from cassandra.query import BatchStatement, BatchType
+from typing import List, Dict, Any, Sequence, Callable, Iterable, Optional
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+import logging
+import os
+import sys
+import threading
+import uuid
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Counter columns only hold integers, so float metrics are stored scaled by this factor
+FLOAT_SCALE = 1000
+FLOAT_COLUMNS = {'engagement', 'click_through_rate', 'watch_time'}
+
+# Post column -> counter column in post_type_daily_rollup
+ROLLUP_COLUMNS = {column: f"sum_{column}" for _, column in POST_METRIC_FIELDS}
+
+UPDATE_POST_TYPE_ROLLUP = (
+    "UPDATE post_type_daily_rollup SET total_posts = total_posts + ?, "
+    + ", ".join(f"{counter} = {counter} + ?" for counter in ROLLUP_COLUMNS.values())
+    + " WHERE day = ? AND post_type = ?"
+)
+SELECT_POST_TYPE_ROLLUP = "SELECT * FROM post_type_daily_rollup WHERE day = ?"
+
+UPDATE_HASHTAG_STATS = (
+    "UPDATE hashtag_daily_stats SET usage_count = usage_count + ?, total_engagement = total_engagement + ? "
+    "WHERE day = ? AND hashtag = ?"
+)
+SELECT_HASHTAG_STATS = "SELECT * FROM hashtag_daily_stats WHERE day = ?"
+
+# Writers keep partial sketches per day; readers merge every partial of the day
+INSERT_HASHTAG_SKETCH = "INSERT INTO hashtag_sketches (day, kind, id, payload) VALUES (?, 'hashtags', ?, ?)"
+SELECT_HASHTAG_SKETCHES = "SELECT payload FROM hashtag_sketches WHERE day = ? AND kind = 'hashtags'"
+SELECT_HASHTAG_SKETCH_PARTIALS = "SELECT id, payload FROM hashtag_sketches WHERE day = ? AND kind = 'hashtags'"
+# Conditional, so a partial replaced or compacted by another process is never deleted or counted twice
+DELETE_HASHTAG_SKETCH = "DELETE FROM hashtag_sketches WHERE day = ? AND kind = 'hashtags' AND id = ? IF EXISTS"
+
+# Bumped after every ingested batch; readers poll this single row to detect new data
+UPDATE_DATA_VERSION = "UPDATE data_versions SET version = version + 1 WHERE name = 'posts'"
+SELECT_DATA_VERSION = "SELECT version FROM data_versions WHERE name = 'posts'"
+
+# Bumped for each day an ingested batch touched, so readers re-read only the days that changed
+UPDATE_DAY_VERSION = "UPDATE day_versions SET version = version + 1 WHERE name = 'posts' AND day = ?"
+SELECT_DAY_VERSIONS = "SELECT day, version FROM day_versions WHERE name = 'posts' AND day >= ?"
+
+# A day is treated as closed (immutable) once it ended this long ago, so late writes still land
+DAY_CLOSE_GRACE = timedelta(minutes=float(os.getenv('ROLLUP_DAY_CLOSE_GRACE_MINUTES', '15')))
+# Closed day buckets kept per kind; a year of history is a few hundred small dicts
+DAY_CACHE_MAX_DAYS = int(os.getenv('ROLLUP_DAY_CACHE_DAYS', '400'))
+
+def rollup_day(created_at: datetime) -> date:
+    """Return the day bucket a post timestamp belongs to"""
+    return created_at.date()
+
+class DayBucketCache:
+    """Per-day partial aggregates of closed days, computed once and reused by every window
+
+    Only today's bucket (and yesterday's, within DAY_CLOSE_GRACE of midnight) is re-read,
+    so a refresh of an N-day window costs one partition read instead of N.
+
+    Writers run in other processes, so each bucket remembers the version of its day
+    in day_versions it was read at; a backdated write moves that day's version and
+    only that day is read again.
+    """
+
+    def __init__(self, max_days: int = DAY_CACHE_MAX_DAYS):
+        self.max_days = max_days
+        self._buckets: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def is_closed(day: date) -> bool:
+        """Return whether no more writes are expected for `day`"""
+        return day < (datetime.now() - DAY_CLOSE_GRACE).date()
+
+    def get(self, kind: str, day: date, version: int = 0) -> Optional[Any]:
+        """Return the cached bucket of `day` if it was read at `version`"""
+        with self._lock:
+            entry = self._buckets.get((kind, day))
+            if entry is None or entry[0] != version:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[1]
+
+    def put(self, kind: str, day: date, bucket: Any, version: int = 0) -> None:
+        """Cache `bucket` as read at `version` if `day` is closed; open days are always re-read"""
+        if not self.is_closed(day):
+            return
+        with self._lock:
+            self._buckets[(kind, day)] = (version, bucket)
+            # Evict the oldest days of this kind past the bound
+            days = sorted(key for key in self._buckets if key[0] == kind)
+            for key in days[:max(0, len(days) - self.max_days)]:
+                del self._buckets[key]
+
+    def invalidate(self, days: Optional[Iterable[date]] = None) -> None:
+        """Drop cached buckets for `days`, or every bucket when `days` is None"""
+        with self._lock:
+            if days is None:
+                self._buckets.clear()
+                return
+            days = set(days)
+            for key in [key for key in self._buckets if key[1] in days]:
+                del self._buckets[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'cached_days': len(self._buckets),
+                'max_days': self.max_days,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0
+            }
+
+# Shared by every window length and refresh in the process
+day_buckets = DayBucketCache()
+
+def _fetch_day_buckets(session, kind: str, query: str, days: int,
+                       read_day: Callable[[Iterable[Dict[str, Any]]], Any]) -> List[Any]:
+    """Return one partial aggregate per day of the window, reading only uncached days"""
+    window = window_days(days)
+    # One small read tells which days other processes have written since they were cached
+    versions = fetch_day_versions(session, window[0])
+    buckets = []
+    futures = []
+    for day in window:
+        bucket = day_buckets.get(kind, day, versions.get(day, 0))
+        if bucket is None:
+            # One small partition per uncached day, fetched concurrently
+            futures.append((day, session.execute_async(prepare(session, query), (day,))))
+        else:
+            buckets.append(bucket)
+
+    for day, future in futures:
+        rows = list(future.result())
+        bucket = read_day(rows)
+        # A day nothing was written to yet may still be backfilled, so only real data is cached
+        if rows:
+            day_buckets.put(kind, day, bucket, versions.get(day, 0))
+        buckets.append(bucket)
+
+    return buckets
+
+def _to_counter(column: str, value: Any) -> int:
+    value = value or 0
+    if column in FLOAT_COLUMNS:
+        return int(round(value * FLOAT_SCALE))
+    return int(value)
+
+def _from_counter(column: str, value: Any) -> float:
+    value = value or 0
+    if column in FLOAT_COLUMNS:
+        return value / FLOAT_SCALE
+    return value
+
+def bump_data_version(session) -> None:
+    """Signal readers in every process that new posts have been written"""
+    session.execute(prepare(session, UPDATE_DATA_VERSION))
+
+def fetch_data_version(session) -> int:
+    """Return the current data version, 0 before anything was written"""
+    row = session.execute(prepare(session, SELECT_DATA_VERSION)).one()
+    return row['version'] if row else 0
+
+def _bump_rebuilt_days(session, days: Iterable[date]) -> None:
+    # Days that lost every row in the rebuild moved too, so every versioned day is bumped
+    bump_day_versions(session, set(days) | set(fetch_day_versions(session, date.min)))
+
+def day_version_values(day: date) -> tuple:
+    """Bind values for UPDATE_DAY_VERSION"""
+    return (day,)
+
+def bump_day_versions(session, days: Iterable[date]) -> None:
+    """Signal readers in every process that the rollups of `days` changed"""
+    update_day_version = prepare(session, UPDATE_DAY_VERSION)
+    for day in set(days):
+        session.execute(update_day_version, day_version_values(day))
+
+def fetch_day_versions(session, first_day: date) -> Dict[date, int]:
+    """Return the version of every written day from `first_day` on"""
+    versions = {}
+    for row in session.execute(prepare(session, SELECT_DAY_VERSIONS), (first_day,)):
+        day = row['day']
+        # The driver returns its own Date type for date columns
+        versions[day.date() if hasattr(day, 'date') else day] = row['version']
+    return versions
+
+def post_type_rollup_values(day: date, post_type: str, sums: Dict[str, Any]) -> tuple:
+    """Bind values for UPDATE_POST_TYPE_ROLLUP"""
+    values = [int(sums['total_posts'])]
+    for column in ROLLUP_COLUMNS:
+        values.append(_to_counter(column, sums[column]))
+    return tuple(values) + (day, post_type)
+
+def _increment_post_type_rollup(session, day: date, post_type: str, sums: Dict[str, Any]) -> None:
+    session.execute(prepare(session, UPDATE_POST_TYPE_ROLLUP), post_type_rollup_values(day, post_type, sums))
+
+def _read_post_type_day(rows: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    sums_by_type = {}
+    for row in rows:
+        sums = sums_by_type[row['post_type']] = empty_post_type_sums(row['post_type'])
+        sums['total_posts'] = row['total_posts'] or 0
+        for column, counter in ROLLUP_COLUMNS.items():
+            sums[column] = _from_counter(column, row[counter])
+    return sums_by_type
+
+def fetch_post_type_rollups(session, days: int) -> Dict[str, Dict[str, Any]]:
+    """Merge the per-day rollups of the last N days into per-type sums"""
+    sums_by_type = {}
+    for bucket in _fetch_day_buckets(session, 'post_type', SELECT_POST_TYPE_ROLLUP, days, _read_post_type_day):
+        # Merging copies into the window totals, so cached buckets are never mutated
+        merge_post_type_sums(sums_by_type, bucket)
+    return sums_by_type
+
+class _DailyPostTypeSums:
+    """Per-day, per-type sums built from a token-range scan of social_media_posts"""
+
+    def __init__(self):
+        self.by_day: Dict[date, Dict[str, Dict[str, Any]]] = {}
+        self.rows = 0
+
+    def add_page(self, page: Sequence[Dict[str, Any]]) -> None:
+        for post in page:
+            if post.get('created_at'):
+                add_post(self.by_day.setdefault(rollup_day(post['created_at']), {}), post)
+                self.rows += 1
+
+    def merge(self, other: "_DailyPostTypeSums") -> None:
+        for day, sums_by_type in other.by_day.items():
+            merge_post_type_sums(self.by_day.setdefault(day, {}), sums_by_type)
+        self.rows += other.rows
+
+def rebuild_post_type_rollups(session) -> int:
+    """Recompute post_type_daily_rollup from social_media_posts"""
+    # Counters are not idempotent, so start from an empty table
+    session.execute("TRUNCATE post_type_daily_rollup")
+
+    sums = parallel_scan(session, 'social_media_posts', 'id', _DailyPostTypeSums)
+    for day, sums_by_type in sums.by_day.items():
+        for post_type, type_sums in sums_by_type.items():
+            _increment_post_type_rollup(session, day, post_type, type_sums)
+    # Buckets cached while the table was being rebuilt are incomplete, in this process and others
+    day_buckets.invalidate()
+    _bump_rebuilt_days(session, sums.by_day)
+
+    logger.info(f"Rebuilt rollups for {sums.rows} posts across {len(sums.by_day)} days")
+    return sums.rows
+
+def hashtag_stats_values(day: date, hashtag: str, usage_count: int, total_engagement: float) -> tuple:
+    """Bind values for UPDATE_HASHTAG_STATS"""
+    return (int(usage_count), _to_counter('engagement', total_engagement), day, hashtag)
+
+def _increment_hashtag_stats(session, day: date, hashtag: str, usage_count: int, total_engagement: float) -> None:
+    session.execute(
+        prepare(session, UPDATE_HASHTAG_STATS),
+        hashtag_stats_values(day, hashtag, usage_count, total_engagement)
+    )
+
+def _read_hashtag_day(rows: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    stats_by_tag = {}
+    for row in rows:
+        add_hashtag(
+            stats_by_tag,
+            row['hashtag'],
+            row['usage_count'] or 0,
+            _from_counter('engagement', row['total_engagement'])
+        )
+    return stats_by_tag
+
+def fetch_hashtag_stats(session, days: int) -> Dict[str, Dict[str, Any]]:
+    """Merge the per-day hashtag stats of the last N days into per-hashtag totals"""
+    stats_by_tag = {}
+    for bucket in _fetch_day_buckets(session, 'hashtag', SELECT_HASHTAG_STATS, days, _read_hashtag_day):
+        for hashtag, stats in bucket.items():
+            add_hashtag(stats_by_tag, hashtag, stats['usage_count'], stats['total_engagement'])
+    return stats_by_tag
+
+def hashtag_sketch_values(day: date, sketch: HashtagSketch) -> tuple:
+    """Bind values for INSERT_HASHTAG_SKETCH"""
+    return (day, uuid.uuid1(), sketch.to_bytes())
+
+def _read_hashtag_sketch_day(rows: Iterable[Dict[str, Any]]) -> HashtagSketch:
+    sketch = HashtagSketch()
+    for row in rows:
+        sketch.merge(HashtagSketch.from_bytes(row['payload']))
+    return sketch
+
+def fetch_hashtag_sketch(session, days: int) -> HashtagSketch:
+    """Merge the per-day hashtag sketches of the last N days into one window sketch"""
+    window = HashtagSketch()
+    for sketch in _fetch_day_buckets(session, 'hashtag_sketch', SELECT_HASHTAG_SKETCHES, days,
+                                     _read_hashtag_sketch_day):
+        window.merge(sketch)
+    return window
+
+class _DailyHashtagStats:
+    """Per-day hashtag stats built from a token-range scan of post_hashtags"""
+
+    def __init__(self):
+        self.by_day: Dict[date, Dict[str, Dict[str, Any]]] = {}
+        self.rows = 0
+
+    def add_page(self, page: Sequence[Dict[str, Any]]) -> None:
+        for row in page:
+            if row.get('hashtag') and row.get('created_at'):
+                add_hashtag(self.by_day.setdefault(rollup_day(row['created_at']), {}),
+                            row['hashtag'], 1, row.get('engagement') or 0)
+                self.rows += 1
+
+    def merge(self, other: "_DailyHashtagStats") -> None:
+        for day, stats_by_tag in other.by_day.items():
+            bucket = self.by_day.setdefault(day, {})
+            for hashtag, stats in stats_by_tag.items():
+                add_hashtag(bucket, hashtag, stats['usage_count'], stats['total_engagement'])
+        self.rows += other.rows
+
+def rebuild_hashtag_stats(session) -> int:
+    """Recompute hashtag_daily_stats from post_hashtags"""
+    session.execute("TRUNCATE hashtag_daily_stats")
+
+    stats = parallel_scan(session, 'post_hashtags', 'post_id', _DailyHashtagStats)
+    for day, stats_by_tag in stats.by_day.items():
+        for hashtag, tag_stats in stats_by_tag.items():
+            _increment_hashtag_stats(session, day, hashtag, tag_stats['usage_count'], tag_stats['total_engagement'])
+    day_buckets.invalidate()
+    _bump_rebuilt_days(session, stats.by_day)
+
+    logger.info(f"Rebuilt hashtag stats for {stats.rows} post hashtags across {len(stats.by_day)} days")
+    return stats.rows
+
+class _DailyHashtagSketches:
+    """Per-day hashtag sketches built from a token-range scan of post_hashtags"""
+
+    def __init__(self):
+        self.by_day: Dict[date, HashtagSketch] = {}
+        self.rows = 0
+
+    def add_page(self, page: Sequence[Dict[str, Any]]) -> None:
+        for row in page:
+            if row.get('hashtag') and row.get('created_at'):
+                day = rollup_day(row['created_at'])
+                sketch = self.by_day.get(day)
+                if sketch is None:
+                    sketch = self.by_day[day] = HashtagSketch()
+                sketch.add(row['hashtag'], row.get('engagement') or 0)
+                self.rows += 1
+
+    def merge(self, other: "_DailyHashtagSketches") -> None:
+        for day, sketch in other.by_day.items():
+            if day in self.by_day:
+                self.by_day[day].merge(sketch)
+            else:
+                self.by_day[day] = sketch
+        self.rows += other.rows
+
+def rebuild_hashtag_sketches(session) -> int:
+    """Recompute hashtag_sketches from post_hashtags, one compacted sketch per day"""
+    session.execute("TRUNCATE hashtag_sketches")
+
+    sketches = parallel_scan(session, 'post_hashtags', 'post_id', _DailyHashtagSketches)
+    insert_sketch = prepare(session, INSERT_HASHTAG_SKETCH)
+    for day, sketch in sketches.by_day.items():
+        session.execute(insert_sketch, hashtag_sketch_values(day, sketch))
+    day_buckets.invalidate()
+    _bump_rebuilt_days(session, sketches.by_day)
+
+    logger.info(f"Rebuilt hashtag sketches for {sketches.rows} post hashtags across {len(sketches.by_day)} days")
+    return sketches.rows
+
+def replace_hashtag_sketches(session, day: date, sketch: HashtagSketch, replaced_ids: Iterable[uuid.UUID]) -> tuple:
+    """Return a batch writing `sketch` as a new partial of `day` in place of `replaced_ids`, and its id
+
+    The batch is a conditional single-partition batch: it applies only if every
+    replaced partial still exists, so a partial another process already folded
+    in is never counted twice and one it wrote meanwhile is never lost.
+    """
+    values = hashtag_sketch_values(day, sketch)
+    batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+    batch.add(prepare(session, INSERT_HASHTAG_SKETCH), values)
+    delete_sketch = prepare(session, DELETE_HASHTAG_SKETCH)
+    for sketch_id in replaced_ids:
+        batch.add(delete_sketch, (day, sketch_id))
+    return batch, values[1]
+
+def compact_hashtag_sketches(session, days: Iterable[date]) -> int:
+    """Replace the partial sketches of each day with their merge and return how many were removed
+
+    A day whose partials changed between the read and the write (a loader
+    replaced its own, or another compaction ran) is left for the next compaction.
+    """
+    select_partials = prepare(session, SELECT_HASHTAG_SKETCH_PARTIALS)
+    removed = 0
+    for day in days:
+        rows = list(session.execute(select_partials, (day,)))
+        if len(rows) < 2:
+            continue
+        batch, _ = replace_hashtag_sketches(session, day, _read_hashtag_sketch_day(rows), [row['id'] for row in rows])
+        if session.execute(batch).was_applied:
+            removed += len(rows) - 1
+    return removed
+
+def compact_closed_hashtag_sketches(session, days: Iterable[date]) -> int:
+    """Compact the sketches of the closed days among `days`
+
+    Open days are skipped because live loaders replace their partials there every
+    chunk, and each such race would only make the compaction back off.
+    """
+    return compact_hashtag_sketches(session, sorted(day for day in set(days) if DayBucketCache.is_closed(day)))
+
+def main():
+    """Rebuild the rollup tables from the raw posts, or compact the hashtag sketches"""
+    if len(sys.argv) < 2 or sys.argv[1] not in ("rebuild", "compact"):
+        print("Usage: python src/rollups.py rebuild|compact [days]")
+        return
+
+    session, _ = get_astra_session()
+    if not session:
+        logger.error("Failed to establish database connection")
+        return
+
+    try:
+        if sys.argv[1] == "compact":
+            days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+            removed = compact_closed_hashtag_sketches(session, window_days(days))
+            logger.info(f"Compacted {removed} partial hashtag sketches over the last {days} days")
+            return
+        rebuild_post_type_rollups(session)
+        rebuild_hashtag_stats(session)
+        rebuild_hashtag_sketches(session)
+        bump_data_version(session)
+    except Exception as e:
+        logger.error(f"Error updating rollups: {str(e)}")
+    finally:
+        shutdown_astra_session()
+
+if __name__ == "__main__":
+    main()
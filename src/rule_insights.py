@@ -0,0 +1,208 @@
+from typing import List, Dict, Any, Optional
+import math
+
+# (metric key, label, unit) compared across post types
+RULE_METRICS = [
+    ('avg_engagement', 'engagement rate', '%'),
+    ('avg_likes', 'likes', ''),
+    ('avg_comments', 'comments', ''),
+    ('avg_shares', 'shares', ''),
+    ('avg_reach', 'reach', ''),
+    ('avg_impressions', 'impressions', ''),
+    ('avg_ctr', 'click-through rate', '%'),
+    ('avg_watch_time', 'watch time', ' s')
+]
+METRIC_LABELS = {key: (label, unit) for key, label, unit in RULE_METRICS}
+
+# A post type this far below the other types' mean on a metric is an improvement area
+WEAK_METRIC_RATIO = 0.25
+# Standard scores beyond this are reported as anomalies (needs at least three post types)
+ANOMALY_Z = 1.5
+# Relative differences smaller than this are treated as noise
+SIGNIFICANT_DIFFERENCE = 0.1
+
+def _posts(row: Dict[str, Any]) -> int:
+    return row.get('total_posts') or 0
+
+def _weighted_mean(rows: List[Dict[str, Any]], key: str, weight: str = 'total_posts') -> float:
+    total = sum(row.get(weight) or 0 for row in rows)
+    if not total:
+        return 0.0
+    return sum((row.get(key) or 0) * (row.get(weight) or 0) for row in rows) / total
+
+def _relative(value: float, reference: float) -> float:
+    """Percentage difference of `value` from `reference`"""
+    return (value - reference) / reference * 100 if reference else 0.0
+
+def _format(key: str, value: float) -> str:
+    label, unit = METRIC_LABELS[key]
+    return f"{value:,.1f}{unit}" if unit else f"{value:,.0f}"
+
+def summarize(metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Post-weighted averages across all post types"""
+    impressions = _weighted_mean(metrics, 'avg_impressions')
+    reach = _weighted_mean(metrics, 'avg_reach')
+    return {
+        'total_posts': sum(_posts(row) for row in metrics),
+        'post_types': len(metrics),
+        'avg_engagement': round(_weighted_mean(metrics, 'avg_engagement'), 2),
+        'avg_ctr': round(_weighted_mean(metrics, 'avg_ctr'), 2),
+        'avg_reach': round(reach, 2),
+        'avg_impressions': round(impressions, 2),
+        'reach_rate': round(reach / impressions * 100, 2) if impressions else 0.0
+    }
+
+def rank_post_types(metrics: List[Dict[str, Any]], summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Post types by engagement, with their share of posts and distance from the average"""
+    total = summary['total_posts']
+    ranking = sorted(metrics, key=lambda row: row.get('avg_engagement') or 0, reverse=True)
+    return [{
+        'post_type': row['post_type'],
+        'total_posts': _posts(row),
+        'share_of_posts': round(_posts(row) / total * 100, 1) if total else 0.0,
+        'avg_engagement': row.get('avg_engagement') or 0,
+        'engagement_delta': round(_relative(row.get('avg_engagement') or 0, summary['avg_engagement']), 1)
+    } for row in ranking]
+
+def rank_hashtags(hashtags: List[Dict[str, Any]], avg_engagement: float) -> List[Dict[str, Any]]:
+    """Hashtags by engagement, each marked boost, keep or review against the average post"""
+    ranking = []
+    for tag in sorted(hashtags, key=lambda row: row.get('avg_engagement') or 0, reverse=True):
+        delta = _relative(tag.get('avg_engagement') or 0, avg_engagement)
+        if delta > SIGNIFICANT_DIFFERENCE * 100:
+            action = 'boost'
+        elif delta < -SIGNIFICANT_DIFFERENCE * 100:
+            action = 'review'
+        else:
+            action = 'keep'
+        ranking.append({
+            'hashtag': tag['hashtag'],
+            'usage_count': tag.get('usage_count') or 0,
+            'avg_engagement': tag.get('avg_engagement') or 0,
+            'engagement_delta': round(delta, 1),
+            'action': action
+        })
+    return ranking
+
+def find_anomalies(metrics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Post type metrics that stand out from the other types by ANOMALY_Z deviations and a significant margin"""
+    anomalies = []
+    for key, _, _ in RULE_METRICS:
+        # Types without a value (e.g. no watch time for images) are not compared
+        rows = [row for row in metrics if row.get(key)]
+        if len(rows) < 3:
+            continue
+        values = [row[key] for row in rows]
+        mean = sum(values) / len(values)
+        deviation = math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+        if not deviation:
+            continue
+        for row in rows:
+            z = (row[key] - mean) / deviation
+            delta = _relative(row[key], mean)
+            if abs(z) >= ANOMALY_Z and abs(delta) >= SIGNIFICANT_DIFFERENCE * 100:
+                anomalies.append({
+                    'post_type': row['post_type'],
+                    'metric': key,
+                    'value': row[key],
+                    'mean': round(mean, 2),
+                    'delta': round(delta, 1),
+                    'z_score': round(z, 2)
+                })
+    return anomalies
+
+def improvement_areas(metrics: List[Dict[str, Any]], post_types: List[Dict[str, Any]],
+                      hashtags: List[Dict[str, Any]]) -> List[str]:
+    """Actionable findings, most important first"""
+    areas = []
+    if len(post_types) > 1:
+        best, worst = post_types[0], post_types[-1]
+        if best['engagement_delta'] >= SIGNIFICANT_DIFFERENCE * 100 and best['share_of_posts'] < 100 / len(post_types):
+            areas.append(f"Post more {best['post_type']} content: it has the highest engagement "
+                         f"({best['avg_engagement']:.1f}%) but only {best['share_of_posts']:.0f}% of posts.")
+
+        worst_row = next(row for row in metrics if row['post_type'] == worst['post_type'])
+        others = [row for row in metrics if row['post_type'] != worst['post_type']]
+        for key, label, _ in RULE_METRICS:
+            if not worst_row.get(key):
+                continue
+            reference = _weighted_mean([row for row in others if row.get(key)], key)
+            if reference and worst_row[key] < reference * (1 - WEAK_METRIC_RATIO):
+                areas.append(f"Improve {label} on {worst['post_type']} posts: "
+                             f"{_format(key, worst_row[key])} vs {_format(key, reference)} for other types.")
+
+    for tag in hashtags:
+        if tag['action'] == 'review':
+            areas.append(f"Reconsider #{tag['hashtag']}: used {tag['usage_count']} times at "
+                         f"{tag['avg_engagement']:.1f}% engagement, {-tag['engagement_delta']:.0f}% below average.")
+    return areas
+
+def generate_rule_insights(metrics: List[Dict[str, Any]], hashtags: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Derive structured insights from the metrics alone, without an LLM"""
+    hashtags = hashtags or []
+    if not metrics:
+        return {'summary': None, 'best_type': None, 'worst_type': None, 'engagement_gap': 0.0,
+                'post_types': [], 'hashtags': [], 'anomalies': [], 'improvement_areas': []}
+
+    summary = summarize(metrics)
+    post_types = rank_post_types(metrics, summary)
+    hashtag_ranking = rank_hashtags(hashtags, summary['avg_engagement'])
+    return {
+        'summary': summary,
+        'best_type': post_types[0]['post_type'],
+        'worst_type': post_types[-1]['post_type'],
+        'engagement_gap': round(post_types[0]['avg_engagement'] - post_types[-1]['avg_engagement'], 2),
+        'post_types': post_types,
+        'hashtags': hashtag_ranking,
+        'anomalies': find_anomalies(metrics),
+        'improvement_areas': improvement_areas(metrics, post_types, hashtag_ranking)
+    }
+
+def render_rule_insights(insights: Dict[str, Any]) -> str:
+    """Render rule-based insights as markdown in the sections of the AI analysis"""
+    summary = insights['summary']
+    if summary is None:
+        return "No posts in this period."
+
+    best, worst = insights['post_types'][0], insights['post_types'][-1]
+    lines = [
+        "## 📊 Overall Performance Summary",
+        f"- **{summary['total_posts']:,}** posts across **{summary['post_types']}** post types",
+        f"- Average engagement **{summary['avg_engagement']:.1f}%**, click-through rate **{summary['avg_ctr']:.1f}%**",
+        f"- Reach is **{summary['reach_rate']:.0f}%** of impressions",
+        "",
+        "## 📈 Content Performance",
+        f"- Best: **{best['post_type'].title()}** at {best['avg_engagement']:.1f}% engagement "
+        f"({best['engagement_delta']:+.0f}% vs average)"
+    ]
+    if len(insights['post_types']) > 1:
+        lines.append(f"- Weakest: **{worst['post_type'].title()}** at {worst['avg_engagement']:.1f}% engagement, "
+                     f"{insights['engagement_gap']:.1f} points behind")
+    lines += [
+        "",
+        "| Post type | Posts | Share | Engagement | vs average |",
+        "|---|---:|---:|---:|---:|"
+    ]
+    for row in insights['post_types']:
+        lines.append(f"| {row['post_type']} | {row['total_posts']:,} | {row['share_of_posts']:.0f}% | "
+                     f"{row['avg_engagement']:.1f}% | {row['engagement_delta']:+.0f}% |")
+
+    if insights['hashtags']:
+        icons = {'boost': '⬆️', 'keep': '➡️', 'review': '⬇️'}
+        lines += ["", "## #️⃣ Hashtag Ranking"]
+        for rank, tag in enumerate(insights['hashtags'], 1):
+            lines.append(f"{rank}. {icons[tag['action']]} **#{tag['hashtag']}**: {tag['avg_engagement']:.1f}% "
+                         f"engagement ({tag['engagement_delta']:+.0f}%), used {tag['usage_count']:,} times")
+
+    if insights['anomalies']:
+        lines += ["", "## ⚠️ Anomalies"]
+        for anomaly in insights['anomalies']:
+            label = METRIC_LABELS[anomaly['metric']][0]
+            direction = "above" if anomaly['delta'] > 0 else "below"
+            lines.append(f"- {anomaly['post_type'].title()} posts: {label} of {_format(anomaly['metric'], anomaly['value'])}, "
+                         f"{abs(anomaly['delta']):.0f}% {direction} the {_format(anomaly['metric'], anomaly['mean'])} "
+                         f"average across types")
+
+    lines += ["", "## 🔍 Areas for Improvement"]
+    lines += [f"- {area}" for area in insights['improvement_areas']] or ["- No significant gaps found."]
+    return "\n".join(lines)
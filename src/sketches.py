@@ -0,0 +1,238 @@
+from aggregation import add_hashtag, top_hashtags
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import math
+import os
+import struct
+import zlib
+import numpy as np
+
+# Count-Min overcount is at most EPSILON * total count with probability 1 - DELTA
+SKETCH_EPSILON = float(os.getenv('SKETCH_EPSILON', '0.005'))
+SKETCH_DELTA = float(os.getenv('SKETCH_DELTA', '0.01'))
+# Relative standard error of the HyperLogLog distinct counts
+SKETCH_HLL_ERROR = float(os.getenv('SKETCH_HLL_ERROR', '0.01'))
+# Candidate hashtags tracked by the heavy-hitters summary
+SKETCH_HEAVY_HITTERS = int(os.getenv('SKETCH_HEAVY_HITTERS', '256'))
+
+# Engagement is a float, Count-Min counts integers
+ENGAGEMENT_SCALE = 1000
+
+# Distinct hashtags buffered before they are hashed into the sketches
+PENDING_LIMIT = 10000
+
+_MASK64 = (1 << 64) - 1
+
+def _hash64(item: str) -> Tuple[int, int]:
+    digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+
+class CountMinSketch:
+    """Mergeable frequency sketch; estimates never undercount"""
+
+    def __init__(self, width: int, depth: int, table: Optional[np.ndarray] = None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+
+    @classmethod
+    def from_error(cls, epsilon: float = SKETCH_EPSILON, delta: float = SKETCH_DELTA) -> "CountMinSketch":
+        """Size the sketch for an overcount of at most epsilon * total with probability 1 - delta"""
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)))
+
+    def _columns(self, item: str) -> List[int]:
+        # Double hashing: depth independent-enough hash functions from one digest
+        h1, h2 = _hash64(item)
+        return [((h1 + row * h2) & _MASK64) % self.width for row in range(self.depth)]
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.table[np.arange(self.depth), self._columns(item)] += count
+
+    def estimate(self, item: str) -> int:
+        return int(self.table[np.arange(self.depth), self._columns(item)].min())
+
+    def merge(self, other: "CountMinSketch") -> None:
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Cannot merge Count-Min sketches of different dimensions")
+        self.table += other.table
+
+    def to_bytes(self) -> bytes:
+        return struct.pack('<II', self.width, self.depth) + self.table.tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "CountMinSketch":
+        width, depth = struct.unpack_from('<II', payload)
+        table = np.frombuffer(payload, dtype=np.int64, offset=8).reshape(depth, width).copy()
+        return cls(width, depth, table)
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch"""
+
+    def __init__(self, precision: int = 14, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def from_error(cls, error: float = SKETCH_HLL_ERROR) -> "HyperLogLog":
+        """Size the sketch for a relative standard error of `error` (1.04 / sqrt(registers))"""
+        return cls(min(18, max(4, math.ceil(math.log2((1.04 / error) ** 2)))))
+
+    def add(self, item: str) -> None:
+        value, _ = _hash64(item)
+        index = value >> (64 - self.precision)
+        rest = (value << self.precision) & _MASK64
+        rank = 64 - rest.bit_length() + 1 if rest else 64 - self.precision + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def to_bytes(self) -> bytes:
+        return struct.pack('<B', self.precision) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "HyperLogLog":
+        precision = struct.unpack_from('<B', payload)[0]
+        return cls(precision, np.frombuffer(payload, dtype=np.uint8, offset=1).copy())
+
+class SpaceSaving:
+    """Bounded heavy-hitters summary: keeps the `capacity` most frequent items seen"""
+
+    def __init__(self, capacity: int = SKETCH_HEAVY_HITTERS, counts: Optional[Dict[str, int]] = None):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = counts or {}
+
+    def add(self, item: str, count: int = 1) -> None:
+        if item in self.counts or len(self.counts) < self.capacity:
+            self.counts[item] = self.counts.get(item, 0) + count
+            return
+        # Replace the least frequent item; its count bounds the newcomer's overestimate
+        victim = min(self.counts, key=self.counts.get)
+        self.counts[item] = self.counts.pop(victim) + count
+
+    def merge(self, other: "SpaceSaving") -> None:
+        for item, count in other.counts.items():
+            self.counts[item] = self.counts.get(item, 0) + count
+        if len(self.counts) > self.capacity:
+            kept = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)[:self.capacity]
+            self.counts = dict(kept)
+
+    def items(self) -> List[str]:
+        return list(self.counts)
+
+    def to_bytes(self) -> bytes:
+        entries = b''.join(
+            struct.pack('<H', len(encoded)) + encoded + struct.pack('<q', count)
+            for encoded, count in ((item.encode('utf-8'), count) for item, count in self.counts.items())
+        )
+        return struct.pack('<I', self.capacity) + entries
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "SpaceSaving":
+        capacity = struct.unpack_from('<I', payload)[0]
+        counts = {}
+        offset = 4
+        while offset < len(payload):
+            length = struct.unpack_from('<H', payload, offset)[0]
+            item = payload[offset + 2:offset + 2 + length].decode('utf-8')
+            counts[item] = struct.unpack_from('<q', payload, offset + 2 + length)[0]
+            offset += 2 + length + 8
+        return cls(capacity, counts)
+
+class HashtagSketch:
+    """Mergeable summary of the post hashtags of one time bucket
+
+    Heavy hitters pick the candidate hashtags, Count-Min estimates their usage and
+    engagement, and HyperLogLog counts distinct hashtags. Its size depends only on
+    the error bounds, not on the number of posts.
+    """
+
+    def __init__(self, epsilon: float = SKETCH_EPSILON, delta: float = SKETCH_DELTA,
+                 hll_error: float = SKETCH_HLL_ERROR, heavy_hitters: int = SKETCH_HEAVY_HITTERS):
+        self.usage = CountMinSketch.from_error(epsilon, delta)
+        self.engagement = CountMinSketch.from_error(epsilon, delta)
+        self.heavy = SpaceSaving(heavy_hitters)
+        self.distinct = HyperLogLog.from_error(hll_error)
+        self.total = 0
+        self._pending: Dict[str, List[float]] = {}
+
+    def add(self, hashtag: str, engagement: float = 0, count: int = 1) -> None:
+        # Hashtags repeat heavily, so pre-aggregate and hash each one once per flush
+        pending = self._pending.get(hashtag)
+        if pending is None:
+            if len(self._pending) >= PENDING_LIMIT:
+                self._flush()
+            pending = self._pending[hashtag] = [0, 0.0]
+        pending[0] += count
+        pending[1] += engagement or 0
+        self.total += count
+
+    def _flush(self) -> None:
+        for hashtag, (count, engagement) in self._pending.items():
+            self.usage.add(hashtag, count)
+            self.engagement.add(hashtag, int(round(engagement * ENGAGEMENT_SCALE)))
+            self.heavy.add(hashtag, count)
+            self.distinct.add(hashtag)
+        self._pending = {}
+
+    def merge(self, other: "HashtagSketch") -> None:
+        self._flush()
+        other._flush()
+        self.usage.merge(other.usage)
+        self.engagement.merge(other.engagement)
+        self.heavy.merge(other.heavy)
+        self.distinct.merge(other.distinct)
+        self.total += other.total
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        """Estimate the `limit` heavy-hitter hashtags with the highest average engagement"""
+        self._flush()
+        stats_by_tag = {}
+        for hashtag in self.heavy.items():
+            add_hashtag(stats_by_tag, hashtag, self.usage.estimate(hashtag),
+                        self.engagement.estimate(hashtag) / ENGAGEMENT_SCALE)
+        return top_hashtags(stats_by_tag, limit)
+
+    def distinct_count(self) -> int:
+        self._flush()
+        return self.distinct.count()
+
+    def to_bytes(self) -> bytes:
+        self._flush()
+        parts = [self.usage.to_bytes(), self.engagement.to_bytes(), self.heavy.to_bytes(), self.distinct.to_bytes()]
+        body = struct.pack('<q', self.total) + b''.join(struct.pack('<I', len(part)) + part for part in parts)
+        # Sketches of quiet days are mostly zero registers and compress well
+        return zlib.compress(body)
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "HashtagSketch":
+        body = zlib.decompress(payload)
+        total = struct.unpack_from('<q', body)[0]
+        parts = []
+        offset = 8
+        while offset < len(body):
+            length = struct.unpack_from('<I', body, offset)[0]
+            parts.append(body[offset + 4:offset + 4 + length])
+            offset += 4 + length
+
+        sketch = cls.__new__(cls)
+        sketch.usage = CountMinSketch.from_bytes(parts[0])
+        sketch.engagement = CountMinSketch.from_bytes(parts[1])
+        sketch.heavy = SpaceSaving.from_bytes(parts[2])
+        sketch.distinct = HyperLogLog.from_bytes(parts[3])
+        sketch.total = total
+        sketch._pending = {}
+        return sketch
@@ -0,0 +1,197 @@
+from analytics import get_post_type_metrics, get_trending_hashtags
+from insight_generator import generate_insights
+from rule_insights import generate_rule_insights
+from metrics_history import metrics_history
+from typing import Dict, Any, Optional
+from datetime import datetime
+import logging
+import os
+import threading
+import time
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = float(os.getenv('SNAPSHOT_INTERVAL', '30'))
+SNAPSHOT_DAYS = int(os.getenv('SNAPSHOT_DAYS', '30'))
+SNAPSHOT_HASHTAGS = int(os.getenv('SNAPSHOT_HASHTAGS', '5'))
+# Whether the refresher also asks the LLM for a narrative on top of the rule-based insights
+SNAPSHOT_LLM_INSIGHTS = os.getenv('SNAPSHOT_LLM_INSIGHTS', 'true').lower() in ('1', 'true', 'yes')
+# Minimum seconds between two background narratives, however often the data changes
+SNAPSHOT_INSIGHTS_INTERVAL = float(os.getenv('SNAPSHOT_INSIGHTS_INTERVAL', '300'))
+
+RADAR_METRICS = ['avg_likes', 'avg_comments', 'avg_shares', 'avg_engagement', 'avg_reach', 'avg_impressions']
+
+def build_funnel(df_metrics: pd.DataFrame) -> pd.DataFrame:
+    """Average impressions -> reach -> engagement funnel across post types"""
+    return pd.DataFrame([{
+        'stage': 'Impressions',
+        'count': df_metrics['avg_impressions'].mean(),
+    }, {
+        'stage': 'Reach',
+        'count': df_metrics['avg_reach'].mean(),
+    }, {
+        'stage': 'Engagement',
+        'count': df_metrics['avg_likes'].mean() + df_metrics['avg_comments'].mean() + df_metrics['avg_shares'].mean(),
+    }, {
+        'stage': 'Likes',
+        'count': df_metrics['avg_likes'].mean(),
+    }, {
+        'stage': 'Comments',
+        'count': df_metrics['avg_comments'].mean(),
+    }, {
+        'stage': 'Shares',
+        'count': df_metrics['avg_shares'].mean(),
+    }])
+
+def build_radar(df_metrics: pd.DataFrame) -> pd.DataFrame:
+    """Radar metrics normalized to a percentage of the best post type"""
+    df_normalized = pd.DataFrame()
+    for metric in RADAR_METRICS:
+        max_val = df_metrics[metric].max()
+        if max_val != 0:  # Avoid division by zero
+            df_normalized[metric] = df_metrics[metric] / max_val * 100
+        else:
+            df_normalized[metric] = df_metrics[metric]
+    return df_normalized
+
+def build_correlation(df_metrics: pd.DataFrame) -> pd.DataFrame:
+    numeric_cols = df_metrics.select_dtypes(include=['float64', 'int64']).columns
+    return df_metrics[numeric_cols].corr()
+
+def build_snapshot(days: int = SNAPSHOT_DAYS, hashtag_limit: int = SNAPSHOT_HASHTAGS) -> Dict[str, Any]:
+    """Compute every dataset the dashboard renders, including rule-based but not LLM insights"""
+    metrics = get_post_type_metrics(days)
+    hashtags = get_trending_hashtags(hashtag_limit, days)
+    df_metrics = pd.DataFrame(metrics)
+
+    return {
+        'created_at': datetime.now(),
+        'metrics': metrics,
+        'hashtags': hashtags,
+        'df_metrics': df_metrics,
+        'df_hashtags': pd.DataFrame(hashtags) if hashtags else pd.DataFrame(),
+        'funnel': build_funnel(df_metrics),
+        'radar': build_radar(df_metrics),
+        'correlation': build_correlation(df_metrics),
+        'rule_insights': generate_rule_insights(metrics, hashtags),
+        'insights': None
+    }
+
+class SnapshotRefresher:
+    """Background thread that periodically rebuilds and publishes the dashboard snapshot
+
+    Snapshots are replaced whole, never modified in place, so readers in any
+    session see either the previous or the next snapshot and must not mutate it.
+
+    The data thread only publishes numbers. The AI narrative is generated by a
+    separate thread, at most once per `insights_interval`, and every snapshot
+    carries the latest narrative.
+    """
+
+    def __init__(self, interval: float = SNAPSHOT_INTERVAL, days: int = SNAPSHOT_DAYS,
+                 hashtag_limit: int = SNAPSHOT_HASHTAGS, insights: bool = SNAPSHOT_LLM_INSIGHTS,
+                 insights_interval: float = SNAPSHOT_INSIGHTS_INTERVAL):
+        self.interval = interval
+        self.days = days
+        self.hashtag_limit = hashtag_limit
+        self.insights = insights
+        self.insights_interval = insights_interval
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._insights: Optional[str] = None
+        self._version = 0
+        self._published = threading.Condition()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._insights_thread: Optional[threading.Thread] = None
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Return the most recently published snapshot, or None before the first refresh"""
+        return self._snapshot
+
+    def wait(self, timeout: Optional[float] = None, newer_than: int = 0) -> Optional[Dict[str, Any]]:
+        """Block until a snapshot with version > `newer_than` is published or `timeout` expires"""
+        with self._published:
+            self._published.wait_for(lambda: self._version > newer_than, timeout)
+        return self._snapshot
+
+    def _publish(self, snapshot: Dict[str, Any]) -> None:
+        # The narrative is attached under the lock, so a data refresh never drops a newer one
+        with self._published:
+            self._version += 1
+            snapshot['version'] = self._version
+            snapshot['insights'] = self._insights
+            self._snapshot = snapshot
+            self._published.notify_all()
+
+    def refresh(self) -> Dict[str, Any]:
+        """Rebuild the snapshot now and publish it"""
+        snapshot = build_snapshot(self.days, self.hashtag_limit)
+        metrics_history.record(snapshot['created_at'], snapshot['metrics'])
+        self._publish(snapshot)
+        return snapshot
+
+    def refresh_insights(self) -> Optional[str]:
+        """Generate the AI narrative for the latest snapshot and republish it with the narrative"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        insights = generate_insights(snapshot['metrics'], snapshot['hashtags'])
+        # generate_insights reports failures as text; keep the last good insights instead
+        if insights and not insights.startswith("Error generating insights"):
+            with self._published:
+                self._insights = insights
+                self._publish(dict(self._snapshot))
+        return self._insights
+
+    def request_refresh(self) -> None:
+        """Wake the refresher before its next scheduled run"""
+        self._wake.set()
+
+    def _run_insights(self) -> None:
+        narrated = None
+        while not self._stopped.is_set():
+            # Sleep until the data changed since the last narrative
+            with self._published:
+                self._published.wait_for(lambda: self._stopped.is_set() or (
+                    self._snapshot is not None and self._snapshot['created_at'] != narrated))
+            if self._stopped.is_set():
+                return
+            narrated = self._snapshot['created_at']
+            try:
+                self.refresh_insights()
+            except Exception as e:
+                logger.error(f"Error generating snapshot insights: {str(e)}")
+            self._stopped.wait(self.insights_interval)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing dashboard snapshot: {str(e)}")
+            self._wake.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            self._wake.clear()
+
+    def start(self) -> "SnapshotRefresher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+            self._thread.start()
+        if self.insights and self._insights_thread is None:
+            self._insights_thread = threading.Thread(target=self._run_insights, name="snapshot-insights",
+                                                     daemon=True)
+            self._insights_thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        with self._published:
+            self._published.notify_all()
+        for thread in (self._thread, self._insights_thread):
+            if thread is not None:
+                thread.join()
+        self._thread = None
+        self._insights_thread = None
@@ -0,0 +1,197 @@
+from aggregation import POST_METRIC_FIELDS, PostTypeAggregator, window_start
+from storage import AnalyticsBackend
+from synthetic_data import generate_posts
+from typing import List, Dict, Any, Iterable, Iterator
+from datetime import datetime
+import argparse
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS social_media_posts (
+        id TEXT PRIMARY KEY,
+        post_type TEXT,
+        content TEXT,
+        created_at REAL,
+        likes INTEGER,
+        comments INTEGER,
+        shares INTEGER,
+        reach INTEGER,
+        impressions INTEGER,
+        engagement REAL,
+        click_through_rate REAL,
+        watch_time REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS posts_created_at ON social_media_posts (created_at, post_type)",
+    """
+    CREATE TABLE IF NOT EXISTS post_hashtags (
+        post_id TEXT,
+        hashtag TEXT,
+        created_at REAL,
+        engagement REAL,
+        PRIMARY KEY (post_id, hashtag)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS hashtags_created_at ON post_hashtags (created_at, hashtag)",
+    "CREATE TABLE IF NOT EXISTS data_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+]
+
+POST_COLUMNS = [
+    'id', 'post_type', 'content', 'created_at', 'likes', 'comments', 'shares',
+    'reach', 'impressions', 'engagement', 'click_through_rate', 'watch_time'
+]
+
+# Same output shape as aggregation.finalize_post_type_metrics, computed by GROUP BY
+POST_TYPE_METRICS_QUERY = (
+    "SELECT post_type, COUNT(*) AS total_posts, "
+    + ", ".join(f"ROUND(AVG(COALESCE({column}, 0)), 2) AS {key}" for key, column in POST_METRIC_FIELDS)
+    + " FROM social_media_posts WHERE created_at >= ? GROUP BY post_type"
+)
+
+TRENDING_HASHTAGS_QUERY = """
+SELECT hashtag,
+       COUNT(*) AS usage_count,
+       ROUND(SUM(COALESCE(engagement, 0)), 2) AS total_engagement,
+       ROUND(SUM(COALESCE(engagement, 0)) / COUNT(*), 2) AS avg_engagement
+FROM post_hashtags
+WHERE created_at >= ? AND hashtag != ''
+GROUP BY hashtag
+ORDER BY avg_engagement DESC
+LIMIT ?
+"""
+
+DISTINCT_HASHTAGS_QUERY = "SELECT COUNT(DISTINCT hashtag) FROM post_hashtags WHERE created_at >= ? AND hashtag != ''"
+
+def _epoch(value: datetime) -> float:
+    return value.timestamp()
+
+class SQLiteBackend(AnalyticsBackend):
+    """Embedded analytics engine for offline runs and benchmarks"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        # sqlite3 connections are not shareable across threads
+        self._local = threading.local()
+        self.create_tables()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def create_tables(self) -> None:
+        """Create the tables and indexes if they do not exist"""
+        conn = self._connection()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def insert_posts(self, posts: Iterable[Dict[str, Any]], chunk_size: int = 10000) -> int:
+        """Insert posts (with optional 'hashtags' lists) and return the number written"""
+        conn = self._connection()
+        iterator = iter(posts)
+        written = 0
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            post_rows = []
+            hashtag_rows = []
+            for post in chunk:
+                row = dict(post, id=str(post['id']), created_at=_epoch(post['created_at']))
+                post_rows.append(tuple(row.get(column) for column in POST_COLUMNS))
+                for hashtag in post.get('hashtags', []):
+                    hashtag_rows.append((row['id'], hashtag, row['created_at'], post.get('engagement')))
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO social_media_posts ({', '.join(POST_COLUMNS)}) "
+                    f"VALUES ({', '.join(['?'] * len(POST_COLUMNS))})",
+                    post_rows
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO post_hashtags (post_id, hashtag, created_at, engagement) VALUES (?, ?, ?, ?)",
+                    hashtag_rows
+                )
+                conn.execute(
+                    "INSERT INTO data_versions (name, version) VALUES ('posts', 1) "
+                    "ON CONFLICT (name) DO UPDATE SET version = version + 1"
+                )
+            written += len(chunk)
+        return written
+
+    def post_type_metrics(self, days: int, percentiles: bool = False) -> List[Dict[str, Any]]:
+        start = _epoch(window_start(days))
+        if percentiles:
+            # SQLite has no percentile aggregate, so stream the window through the running aggregator
+            aggregator = PostTypeAggregator(percentiles=True)
+            for page in self.iter_post_pages(days, 10000):
+                aggregator.add_page(page)
+            return aggregator.result()
+
+        rows = self._connection().execute(POST_TYPE_METRICS_QUERY, (start,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def trending_hashtags(self, limit: int, days: int, approximate: bool = False) -> List[Dict[str, Any]]:
+        # The indexed GROUP BY is already cheap locally, so approximate requests are answered exactly
+        start = _epoch(window_start(days))
+        rows = self._connection().execute(TRENDING_HASHTAGS_QUERY, (start, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def distinct_hashtags(self, days: int, approximate: bool = False) -> int:
+        start = _epoch(window_start(days))
+        return self._connection().execute(DISTINCT_HASHTAGS_QUERY, (start,)).fetchone()[0]
+
+    def iter_post_pages(self, days: int, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+        start = _epoch(window_start(days))
+        # Streaming responses resume the generator on any worker thread, so the cursor gets
+        # a connection of its own instead of the calling thread's
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(
+                f"SELECT {', '.join(POST_COLUMNS)} FROM social_media_posts WHERE created_at >= ?", (start,)
+            )
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    return
+                page = []
+                for row in rows:
+                    post = dict(row)
+                    post['created_at'] = datetime.fromtimestamp(post['created_at'])
+                    page.append(post)
+                yield page
+        finally:
+            conn.close()
+
+    def data_version(self) -> int:
+        row = self._connection().execute("SELECT version FROM data_versions WHERE name = 'posts'").fetchone()
+        return row[0] if row else 0
+
+def main():
+    """Seed a local SQLite analytics database with synthetic posts"""
+    parser = argparse.ArgumentParser(description="Seed the local SQLite analytics backend")
+    parser.add_argument("--path", default=os.getenv('ANALYTICS_SQLITE_PATH', 'analytics.sqlite3'), help="database file")
+    parser.add_argument("--posts", type=int, default=100000, help="number of posts to generate")
+    parser.add_argument("--days", type=int, default=30, help="spread posts over the last N days")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    args = parser.parse_args()
+
+    backend = SQLiteBackend(args.path)
+    started = time.perf_counter()
+    written = backend.insert_posts(generate_posts(args.posts, days=args.days, seed=args.seed))
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {written} posts into {args.path} in {elapsed:.2f}s ({written / elapsed:.0f} posts/sec)")
+
+if __name__ == "__main__":
+    main()
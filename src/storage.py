@@ -0,0 +1,69 @@
+from typing import Callable, Dict, Iterator, List, Any, Optional
+import os
+import threading
+
+class AnalyticsBackend:
+    """Storage engine that answers the analytics queries"""
+
+    name = ''
+
+    def post_type_metrics(self, days: int, percentiles: bool = False) -> List[Dict[str, Any]]:
+        """Return averaged metrics (and optionally engagement percentiles) per post type for the last N days"""
+        raise NotImplementedError
+
+    def trending_hashtags(self, limit: int, days: int, approximate: bool = False) -> List[Dict[str, Any]]:
+        """Return the top hashtags by average engagement for the last N days
+
+        With `approximate`, backends may answer from mergeable sketches within the configured error bounds.
+        """
+        raise NotImplementedError
+
+    def distinct_hashtags(self, days: int, approximate: bool = False) -> int:
+        """Return the number of distinct hashtags used in the last N days"""
+        raise NotImplementedError
+
+    def iter_post_pages(self, days: int, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the raw posts of the last N days in pages of at most `page_size` rows"""
+        raise NotImplementedError
+
+    def data_version(self) -> int:
+        """Return a number that changes whenever posts are written, cheap enough to poll every second"""
+        raise NotImplementedError
+
+def _astra_backend() -> AnalyticsBackend:
+    from astra_backend import AstraBackend
+    return AstraBackend()
+
+def _sqlite_backend() -> AnalyticsBackend:
+    from sqlite_backend import SQLiteBackend
+    return SQLiteBackend(os.getenv('ANALYTICS_SQLITE_PATH', 'analytics.sqlite3'))
+
+def _parquet_backend() -> AnalyticsBackend:
+    from parquet_backend import ParquetBackend
+    return ParquetBackend(os.getenv('ANALYTICS_PARQUET_PATH', 'snapshot'))
+
+# Backends are imported lazily so e.g. the SQLite engine works without the Cassandra driver
+_factories: Dict[str, Callable[[], AnalyticsBackend]] = {
+    'astra': _astra_backend,
+    'sqlite': _sqlite_backend,
+    'parquet': _parquet_backend
+}
+_instances: Dict[str, AnalyticsBackend] = {}
+_lock = threading.Lock()
+
+def register_backend(name: str, factory: Callable[[], AnalyticsBackend]) -> None:
+    """Make a backend selectable through ANALYTICS_BACKEND"""
+    _factories[name] = factory
+
+def get_backend(name: Optional[str] = None) -> AnalyticsBackend:
+    """Return the configured backend instance, creating it on first use"""
+    name = name or os.getenv('ANALYTICS_BACKEND', 'astra')
+    backend = _instances.get(name)
+    if backend is None:
+        if name not in _factories:
+            raise ValueError(f"Unknown analytics backend '{name}', expected one of {sorted(_factories)}")
+        with _lock:
+            backend = _instances.get(name)
+            if backend is None:
+                backend = _instances[name] = _factories[name]()
+    return backend
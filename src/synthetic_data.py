@@ -0,0 +1,55 @@
+from typing import List, Dict, Any, Iterator, Optional
+from datetime import datetime, timedelta
+import random
+import uuid
+
+# Relative frequency and typical like count of each generated post type
+POST_TYPE_PROFILES = {
+    'photo': {'weight': 0.35, 'median_likes': 120},
+    'video': {'weight': 0.25, 'median_likes': 180},
+    'text': {'weight': 0.2, 'median_likes': 60},
+    'carousel': {'weight': 0.1, 'median_likes': 150},
+    'reel': {'weight': 0.1, 'median_likes': 260}
+}
+
+HASHTAG_VOCABULARY = [
+    'tech', 'ai', 'innovation', 'future', 'coding', 'startup', 'data', 'cloud', 'python', 'design',
+    'marketing', 'growth', 'product', 'devops', 'security', 'ml', 'analytics', 'web3', 'mobile', 'ux'
+]
+
+def generate_posts(count: int, days: int = 30, post_types: Optional[List[str]] = None,
+                   seed: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield `count` synthetic posts with realistic, long-tailed metric distributions"""
+    rng = random.Random(seed)
+    types = post_types or list(POST_TYPE_PROFILES)
+    weights = [POST_TYPE_PROFILES.get(t, {'weight': 1.0})['weight'] for t in types]
+    # Zipf-like hashtag popularity: a few tags dominate, most are rare
+    tag_weights = [1 / (rank + 1) for rank in range(len(HASHTAG_VOCABULARY))]
+    now = datetime.now()
+
+    for _ in range(count):
+        post_type = rng.choices(types, weights)[0]
+        median_likes = POST_TYPE_PROFILES.get(post_type, {'median_likes': 100})['median_likes']
+
+        likes = int(rng.lognormvariate(0, 0.8) * median_likes)
+        comments = int(likes * rng.uniform(0.05, 0.3))
+        shares = int(likes * rng.uniform(0.02, 0.2))
+        reach = max(1, int(likes * rng.uniform(6, 15)))
+        impressions = int(reach * rng.uniform(1.1, 1.8))
+        engagement = round((likes + comments + shares) / reach * 100, 2)
+
+        yield {
+            'id': uuid.uuid4(),
+            'post_type': post_type,
+            'content': f"Generated {post_type} post",
+            'created_at': now - timedelta(seconds=rng.uniform(0, days * 86400)),
+            'likes': likes,
+            'comments': comments,
+            'shares': shares,
+            'reach': reach,
+            'impressions': impressions,
+            'engagement': engagement,
+            'click_through_rate': round(engagement * rng.uniform(0.1, 0.5), 2),
+            'watch_time': round(rng.uniform(5, 90), 1) if post_type in ('video', 'reel') else 0.0,
+            'hashtags': sorted(set(rng.choices(HASHTAG_VOCABULARY, tag_weights, k=rng.randint(1, 5))))
+        }
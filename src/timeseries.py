@@ -0,0 +1,116 @@
+from db_connection import get_astra_session, prepare, shutdown_astra_session
+from aggregation import window_start, window_days
+from rollups import rollup_day
+from typing import List, Dict, Any, Iterator, Optional
+from collections import deque
+import itertools
+import logging
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns of social_media_posts_by_day, partitioned by (post_type, day) and clustered by created_at
+POSTS_BY_DAY_COLUMNS = [
+    'post_type', 'day', 'created_at', 'id', 'content', 'likes', 'comments', 'shares',
+    'reach', 'impressions', 'engagement', 'click_through_rate', 'watch_time'
+]
+
+INSERT_POST_BY_DAY = f"""
+INSERT INTO social_media_posts_by_day ({', '.join(POSTS_BY_DAY_COLUMNS)})
+VALUES ({', '.join(['?'] * len(POSTS_BY_DAY_COLUMNS))})
+"""
+INSERT_POST_TYPE = "INSERT INTO post_types (post_type) VALUES (?)"
+SELECT_BUCKET_POSTS = "SELECT * FROM social_media_posts_by_day WHERE post_type = ? AND day = ? AND created_at >= ?"
+
+# Backfill keeps at most this many writes in flight
+BACKFILL_CONCURRENCY = 64
+
+# Bucket queries issued ahead of the one currently being consumed
+BUCKET_PREFETCH = 4
+
+def post_by_day_values(post: Dict[str, Any]) -> tuple:
+    """Bind values for INSERT_POST_BY_DAY"""
+    row = dict(post, day=rollup_day(post['created_at']))
+    return tuple(row.get(column) for column in POSTS_BY_DAY_COLUMNS)
+
+def list_post_types(session) -> List[str]:
+    """Return every post type that has been written to the time-partitioned table"""
+    return [row['post_type'] for row in session.execute("SELECT post_type FROM post_types")]
+
+def iter_window_pages(session, days: int, fetch_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yield pages of the last N days' posts with one paged query per (post_type, day) bucket"""
+    start = window_start(days)
+    buckets = iter([(post_type, day) for post_type in list_post_types(session) for day in window_days(days)])
+    select_bucket = prepare(session, SELECT_BUCKET_POSTS)
+
+    def query(bucket, paging_state=None):
+        statement = select_bucket.bind(bucket + (start,))
+        statement.fetch_size = fetch_size or session.default_fetch_size
+        return session.execute_async(statement, paging_state=paging_state)
+
+    # A few buckets are kept in flight so round trips overlap while memory stays bounded
+    pending = deque((bucket, query(bucket)) for bucket in itertools.islice(buckets, BUCKET_PREFETCH))
+    while pending:
+        bucket, future = pending.popleft()
+        next_bucket = next(buckets, None)
+        if next_bucket is not None:
+            pending.append((next_bucket, query(next_bucket)))
+
+        result = future.result()
+        while True:
+            yield result.current_rows
+            if not result.paging_state:
+                break
+            result = query(bucket, result.paging_state).result()
+
+def backfill_posts_by_day(session) -> int:
+    """Copy every row of social_media_posts into social_media_posts_by_day"""
+    insert_post = prepare(session, INSERT_POST_BY_DAY)
+    post_types = set()
+    in_flight = []
+    copied = 0
+
+    for post in session.execute("SELECT * FROM social_media_posts"):
+        if not post.get('created_at') or not post.get('post_type'):
+            continue
+        in_flight.append(session.execute_async(insert_post, post_by_day_values(post)))
+        post_types.add(post['post_type'])
+        copied += 1
+
+        if len(in_flight) >= BACKFILL_CONCURRENCY:
+            for future in in_flight:
+                future.result()
+            in_flight = []
+            if copied % 10000 == 0:
+                logger.info(f"Copied {copied} posts")
+
+    for future in in_flight:
+        future.result()
+
+    for post_type in post_types:
+        session.execute(prepare(session, INSERT_POST_TYPE), (post_type,))
+
+    logger.info(f"Backfilled {copied} posts into social_media_posts_by_day")
+    return copied
+
+def main():
+    """Migrate existing posts into the time-partitioned layout"""
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("Usage: python src/timeseries.py backfill")
+        return
+
+    session, _ = get_astra_session()
+    if not session:
+        logger.error("Failed to establish database connection")
+        return
+
+    try:
+        backfill_posts_by_day(session)
+    except Exception as e:
+        logger.error(f"Error backfilling posts: {str(e)}")
+    finally:
+        shutdown_astra_session()
+
+if __name__ == "__main__":
+    main()
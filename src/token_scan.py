@@ -0,0 +1,81 @@
+from db_connection import iter_statement_pages
+from aggregation import PostTypeAggregator, HashtagAggregator, window_start
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Murmur3Partitioner token range; no partition key hashes to MIN_TOKEN itself
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', str(os.cpu_count() or 4)))
+# More splits than workers keeps every worker busy when some ranges are denser than others
+SCAN_SPLITS = int(os.getenv('SCAN_SPLITS', str(SCAN_WORKERS * 4)))
+
+def split_token_ring(splits: int) -> List[Tuple[int, int]]:
+    """Split the token ring into `splits` contiguous (start, end] ranges"""
+    width = (MAX_TOKEN - MIN_TOKEN) // splits
+    ranges = []
+    start = MIN_TOKEN
+    for index in range(splits):
+        end = MAX_TOKEN if index == splits - 1 else start + width
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def parallel_scan(session, table: str, key_column: str, make_partial: Callable[[], Any],
+                  row_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                  splits: Optional[int] = None, workers: Optional[int] = None) -> Any:
+    """Scan `table` by token sub-range on a thread pool and merge the partial aggregates
+
+    `make_partial` returns an object with add_page(page) and merge(other).
+    """
+    splits = splits or SCAN_SPLITS
+    workers = workers or SCAN_WORKERS
+    query = f"SELECT * FROM {table} WHERE token({key_column}) > ? AND token({key_column}) <= ?"
+
+    def scan_range(token_range: Tuple[int, int]) -> Any:
+        partial = make_partial()
+        for page in iter_statement_pages(session, query, token_range):
+            partial.add_page([row for row in page if row_filter(row)] if row_filter else page)
+        return partial
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(scan_range, split_token_ring(splits)))
+
+    result = partials[0]
+    for partial in partials[1:]:
+        result.merge(partial)
+
+    logger.info(f"Scanned {table} in {splits} token ranges on {workers} workers "
+                f"in {time.perf_counter() - started:.2f}s")
+    return result
+
+def _created_since(days: Optional[int]) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    if days is None:
+        return None
+    start = window_start(days)
+    return lambda row: not row.get('created_at') or row['created_at'] >= start
+
+def scan_post_type_metrics(session, days: Optional[int] = None, percentiles: bool = False,
+                           splits: Optional[int] = None, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Recompute per-type metrics from a parallel scan of social_media_posts"""
+    aggregator = parallel_scan(
+        session, 'social_media_posts', 'id', lambda: PostTypeAggregator(percentiles=percentiles),
+        row_filter=_created_since(days), splits=splits, workers=workers
+    )
+    return aggregator.result()
+
+def scan_hashtag_stats(session, limit: int, days: Optional[int] = None,
+                       splits: Optional[int] = None, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Recompute the hashtag leaderboard from a parallel scan of post_hashtags"""
+    aggregator = parallel_scan(
+        session, 'post_hashtags', 'post_id', HashtagAggregator,
+        row_filter=_created_since(days), splits=splits, workers=workers
+    )
+    return aggregator.top(limit)